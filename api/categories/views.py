@@ -3,10 +3,17 @@ from sqlalchemy.orm import Session
 
 from ..common.parsing import parse_bool
 from api.categories import models
+from api.common.integrity import commit_or_conflict_sync
+from api.public.menu_cache import invalidate_menu
 from core.db import get_db
 from deps.permissions import AdminOnly
 from main import app
 
+CATEGORY_CONFLICTS = {
+    "id"     : "Category id already exists",
+    "name"   : "Category name already exists",
+    "name_lc": "Category name_lc already exists",
+}
 
 @app.post("/category", tags=["Category"])
 async def create_category(
@@ -18,13 +25,6 @@ async def create_category(
     db         : Session    = Depends(get_db),
     _=AdminOnly,
 ):
-    exists = db.query(models.CategoriesModel).filter(models.CategoriesModel.name == name).first()
-    if exists:
-        raise HTTPException(
-            status_code=409, 
-            detail="Category name already exists"
-        )
-
     new_category = models.CategoriesModel(
         id          = id,
         name        = name,
@@ -34,7 +34,8 @@ async def create_category(
     )
 
     db.add(new_category)
-    db.commit()
+    commit_or_conflict_sync(db, CATEGORY_CONFLICTS)
+    invalidate_menu()
     db.refresh(new_category)
     return new_category
 
@@ -83,13 +84,7 @@ async def update_category(
             detail=f"ID {category_id} not found"
         )
 
-    if name is not None and name != category.name:
-        exists = db.query(models.CategoriesModel).filter(models.CategoriesModel.name == name).first()
-        if exists:
-            raise HTTPException(
-                status_code=409, 
-                detail="Category name already exists"
-            )
+    if name is not None:
         category.name = name
 
     if name_lc is not None:
@@ -107,7 +102,8 @@ async def update_category(
             )
         category.is_active = parsed
 
-    db.commit()
+    commit_or_conflict_sync(db, CATEGORY_CONFLICTS)
+    invalidate_menu()
     db.refresh(category)
     return category
 
@@ -126,6 +122,7 @@ async def delete_category(
 
     db.delete(category)
     db.commit()
+    invalidate_menu()
     return {
         "message": "Delete successfully", 
         "id": category_id
@@ -0,0 +1,11 @@
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+def dialect_insert(db):
+    """
+    Return the dialect-specific `insert` (with `on_conflict_do_*` support) for
+    the session's engine: Postgres in production, SQLite for local test runs.
+    """
+    if db.bind.dialect.name == "sqlite":
+        return sqlite.insert
+    return postgresql.insert
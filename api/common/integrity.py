@@ -0,0 +1,99 @@
+import re
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+UNIQUE_VIOLATION = "23505"
+
+# Postgres: 'Key (code)=(T1) already exists.'  SQLite: 'UNIQUE constraint failed: tbl_table.code'
+_PG_KEY = re.compile(r"Key \(([^)]+)\)=")
+_SQLITE_KEY = re.compile(r"UNIQUE constraint failed: ([\w., ]+)")
+
+
+def _driver_error(exc: IntegrityError):
+    # asyncpg errors arrive wrapped in SQLAlchemy's DBAPI adapter
+    orig = exc.orig
+    return getattr(orig, "__cause__", None) or orig
+
+
+def is_unique_violation(exc: IntegrityError) -> bool:
+    err = _driver_error(exc)
+    code = getattr(err, "sqlstate", None) or getattr(err, "pgcode", None)
+    if code is not None:
+        return code == UNIQUE_VIOLATION
+    message = str(exc.orig)
+    return "UNIQUE constraint" in message or "duplicate key" in message
+
+
+def violated_columns(exc: IntegrityError) -> list[str]:
+    err = _driver_error(exc)
+    detail = getattr(err, "detail", None)
+    if detail is None and getattr(err, "diag", None) is not None:
+        detail = err.diag.message_detail
+    text = f"{detail or ''} {exc.orig}"
+
+    match = _PG_KEY.search(text)
+    if match:
+        return [col.strip() for col in match.group(1).split(",")]
+    match = _SQLITE_KEY.search(text)
+    if match:
+        return [col.strip().rsplit(".", 1)[-1] for col in match.group(1).split(",")]
+    return []
+
+
+def conflict_error(exc: IntegrityError, conflicts: dict[str, str]) -> HTTPException | None:
+    """
+    409 for a unique/primary-key violation, with the message registered for
+    the offending column in `conflicts` (or conflicts["*"]). None for any
+    other integrity error.
+    """
+    if not is_unique_violation(exc):
+        return None
+    detail = None
+    for column in violated_columns(exc):
+        detail = conflicts.get(column)
+        if detail:
+            break
+    return HTTPException(
+        status_code=409,
+        detail=detail or conflicts.get("*", "Already exists")
+    )
+
+
+@asynccontextmanager
+async def unique_conflicts(db: AsyncSession, conflicts: dict[str, str]):
+    """
+    Wrap the statements that flush new rows (autoflush counts) and let the
+    unique constraints decide: a duplicate rolls back and comes out as 409
+    instead of being looked up beforehand.
+    """
+    try:
+        yield
+    except IntegrityError as exc:
+        await db.rollback()
+        error = conflict_error(exc, conflicts)
+        if error is None:
+            raise
+        raise error from None
+
+
+async def commit_or_conflict(db: AsyncSession, conflicts: dict[str, str]) -> None:
+    async with unique_conflicts(db, conflicts):
+        await db.commit()
+
+
+def commit_or_conflict_sync(db: Session, conflicts: dict[str, str]) -> None:
+    """
+    commit_or_conflict for the synchronous Session.
+    """
+    try:
+        db.commit()
+    except IntegrityError as exc:
+        db.rollback()
+        error = conflict_error(exc, conflicts)
+        if error is None:
+            raise
+        raise error from None
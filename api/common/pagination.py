@@ -0,0 +1,57 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any
+
+from fastapi import HTTPException, Response
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*values: Any) -> str:
+    """
+    Build an opaque `after` token from the sort key of the last row on a page.
+    """
+    parts = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(parts, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str, size: int) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except Exception:
+        values = None
+
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid cursor"
+        )
+    return values
+
+
+def decode_time_cursor(token: str) -> tuple[datetime, str]:
+    """
+    Decode a `(created_at, id)` cursor.
+    """
+    created_at, row_id = decode_cursor(token, 2)
+    try:
+        return datetime.fromisoformat(created_at), str(row_id)
+    except (TypeError, ValueError):
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid cursor"
+        )
+
+
+def set_next_cursor(response: Response, rows: list, limit: int, *key_attrs: str) -> None:
+    """
+    Expose the cursor for the next page in the `X-Next-Cursor` header when the
+    page is full, so list bodies keep their existing shape.
+    """
+    if not rows or len(rows) < limit:
+        return
+    last = rows[-1]
+    response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*(getattr(last, attr) for attr in key_attrs))
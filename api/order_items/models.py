@@ -1,5 +1,6 @@
 from core.db import Base
 from sqlalchemy import Column, String, Integer, ForeignKey
+from sqlalchemy.orm import relationship
 
 
 class OrderItemModel(Base):
@@ -14,4 +15,6 @@ class OrderItemModel(Base):
     unit_price_khr = Column(Integer, nullable=False)                                        # riel
     qty            = Column(Integer, nullable=False)
     line_total_usd = Column(Integer, nullable=False)
-    line_total_khr = Column(Integer, nullable=False)
\ No newline at end of file
+    line_total_khr = Column(Integer, nullable=False)
+
+    product        = relationship("ProductModel", viewonly=True)
\ No newline at end of file
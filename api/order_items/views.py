@@ -1,48 +1,67 @@
-from fastapi import Depends, Form, HTTPException
-from sqlalchemy.orm import Session
+from datetime import datetime
+from fastapi import Depends, Form, HTTPException, Response
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from deps.permissions import AdminOnly
 from main import app
-from core.db import get_db
+from core.db import get_async_db
+from api.common.integrity import unique_conflicts
+from api.common.pagination import decode_cursor, set_next_cursor
 from api.order_items import models as item_models
 from api.orders import models as order_models
+from api.orders.events import ORDER_ITEMS_CHANGED, publish_order_event
 from api.products import models as product_models
+from api.public.order_cache import invalidate_public_order
 
 
-def recalc_order_totals(db: Session, order_id: str) -> None:
+async def recalc_order_totals(db: AsyncSession, order_id: str):
     """
     Recalculate order subtotal/total from order_items.
     Here we store totals in KHR (common for KHQR).
     If you want USD totals instead, change to sum USD.
-    """
-    items = db.query(item_models.OrderItemModel).filter(
-        item_models.OrderItemModel.order_id == order_id
-    ).all()
 
-    subtotal_khr = sum(i.line_total_khr for i in items)
-    total_khr = subtotal_khr  
-    order = db.query(order_models.OrderModel).filter(order_models.OrderModel.id == order_id).first()
-    if order:
-        order.subtotal_amount = subtotal_khr
-        order.total_amount = total_khr
+    Done as one UPDATE ... SET = (SELECT SUM(...)) so the cost doesn't grow
+    with the number of items in the order. Pending item changes in the
+    session are flushed first by autoflush. Returns the updated order's
+    summary row (see order_snapshot), or None if it does not exist.
+    """
+    subtotal_khr = (
+        select(func.coalesce(func.sum(item_models.OrderItemModel.line_total_khr), 0))
+        .where(item_models.OrderItemModel.order_id == order_id)
+        .scalar_subquery()
+    )
+    O = order_models.OrderModel
+    result = await db.execute(
+        update(O)
+        .where(O.id == order_id)
+        .values(
+            subtotal_amount = subtotal_khr,
+            total_amount    = subtotal_khr,
+            updated_at      = datetime.utcnow(),
+        )
+        .returning(O.id, O.order_no, O.table_id, O.status, O.payment_status, O.total_amount, O.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    return result.first()
 
 
 @app.post("/order_item", tags=["Order Item"])
 async def create_order_item(
-    id        : str     = Form(...),
-    order_id  : str     = Form(...),
-    product_id: str     = Form(...),
-    qty       : int     = Form(...),
-    db        : Session = Depends(get_db),
+    id        : str          = Form(...),
+    order_id  : str          = Form(...),
+    product_id: str          = Form(...),
+    qty       : int          = Form(...),
+    db        : AsyncSession = Depends(get_async_db),
     _=AdminOnly,
 ):
-    order = db.query(order_models.OrderModel).filter(order_models.OrderModel.id == order_id).first()
+    order = await db.get(order_models.OrderModel, order_id)
     if not order:
         raise HTTPException(
             status_code=404, 
             detail=f"Order {order_id} not found"
         )
 
-    product = db.query(product_models.ProductModel).filter(product_models.ProductModel.id == product_id).first()
+    product = await db.get(product_models.ProductModel, product_id)
     if not product:
         raise HTTPException(
             status_code=404, 
@@ -61,13 +80,6 @@ async def create_order_item(
             detail="qty must be > 0"
         )
 
-    exists = db.query(item_models.OrderItemModel).filter(item_models.OrderItemModel.id == id).first()
-    if exists:
-        raise HTTPException(
-            status_code=409, 
-            detail="Order item id already exists"
-        )
-
     product_name    = product.name
     product_name_lc = product.name_lc
     unit_usd        = product.price_usd
@@ -87,33 +99,46 @@ async def create_order_item(
     )
 
     db.add(new_item)
-    recalc_order_totals(db, order_id)
-    db.commit()
-    db.refresh(new_item)
+    async with unique_conflicts(db, {"id": "Order item id already exists"}):
+        summary = await recalc_order_totals(db, order_id)
+        await db.commit()
+    invalidate_public_order(order_id)
+    publish_order_event(ORDER_ITEMS_CHANGED, summary, item_id=id, change="added")
+    await db.refresh(new_item)
     return new_item
 
 @app.get("/order_item", tags=["Order Item"])
 async def get_all_order_items(
-    skip    : int        = 0,
-    limit   : int        = 50,
-    order_id: str | None = None,
-    db      : Session    = Depends(get_db),
+    response: Response,
+    skip    : int          = 0,
+    limit   : int          = 50,
+    order_id: str | None   = None,
+    after   : str | None   = None,
+    db      : AsyncSession = Depends(get_async_db),
     _=AdminOnly,
 ):
-    q = db.query(item_models.OrderItemModel)
+    q = select(item_models.OrderItemModel)
 
     if order_id:
-        q = q.filter(item_models.OrderItemModel.order_id == order_id)
+        q = q.where(item_models.OrderItemModel.order_id == order_id)
+
+    if after is not None:
+        (after_id,) = decode_cursor(after, 1)
+        q = q.where(item_models.OrderItemModel.id > str(after_id))
+    elif skip:
+        q = q.offset(skip)
 
-    items = q.offset(skip).limit(limit).all()
+    result = await db.execute(q.order_by(item_models.OrderItemModel.id).limit(limit))
+    items = result.scalars().all()
+    set_next_cursor(response, items, limit, "id")
     return items
 
 @app.get("/order_item/{item_id}", tags=["Order Item"])
 async def get_order_item_by_id(
     item_id: str,
-    db     : Session = Depends(get_db),
+    db     : AsyncSession = Depends(get_async_db),
 ):
-    item = db.query(item_models.OrderItemModel).filter(item_models.OrderItemModel.id == item_id).first()
+    item = await db.get(item_models.OrderItemModel, item_id)
     if not item:
         raise HTTPException(
             status_code=404, 
@@ -125,10 +150,10 @@ async def get_order_item_by_id(
 async def update_order_item(
     item_id: str,
     qty    : int | None = Form(None),
-    db     : Session = Depends(get_db),
+    db     : AsyncSession = Depends(get_async_db),
     _=AdminOnly,
 ):
-    item = db.query(item_models.OrderItemModel).filter(item_models.OrderItemModel.id == item_id).first()
+    item = await db.get(item_models.OrderItemModel, item_id)
     if not item:
         raise HTTPException(
             status_code=404, 
@@ -146,18 +171,20 @@ async def update_order_item(
         item.line_total_usd = item.unit_price_usd * qty
         item.line_total_khr = item.unit_price_khr * qty
 
-    recalc_order_totals(db, item.order_id)
-    db.commit()
-    db.refresh(item)
+    summary = await recalc_order_totals(db, item.order_id)
+    await db.commit()
+    invalidate_public_order(item.order_id)
+    publish_order_event(ORDER_ITEMS_CHANGED, summary, item_id=item_id, change="updated")
+    await db.refresh(item)
     return item
 
 @app.delete("/order_item/{item_id}", tags=["Order Item"])
 async def delete_order_item(
     item_id: str,
-    db     : Session = Depends(get_db),
+    db     : AsyncSession = Depends(get_async_db),
     _=AdminOnly,
 ):
-    item = db.query(item_models.OrderItemModel).filter(item_models.OrderItemModel.id == item_id).first()
+    item = await db.get(item_models.OrderItemModel, item_id)
     if not item:
         raise HTTPException(
             status_code=404, 
@@ -165,10 +192,13 @@ async def delete_order_item(
         )
 
     order_id = item.order_id
-    db.delete(item)
-    recalc_order_totals(db, order_id)
+    await db.delete(item)
+    summary = await recalc_order_totals(db, order_id)
 
-    db.commit()
+    await db.commit()
+    invalidate_public_order(order_id)
+    if summary is not None:
+        publish_order_event(ORDER_ITEMS_CHANGED, summary, item_id=item_id, change="deleted")
     return {
         "message": "Delete successfully", 
         "id": item_id
@@ -0,0 +1,160 @@
+import asyncio
+import json
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Optional
+
+ORDER_EVENTS_QUEUE_SIZE = int(os.getenv("ORDER_EVENTS_QUEUE_SIZE", "256"))
+ORDER_EVENTS_KEEPALIVE = float(os.getenv("ORDER_EVENTS_KEEPALIVE", "20"))
+
+ORDER_CREATED = "order.created"
+ORDER_UPDATED = "order.updated"
+ORDER_STATUS_CHANGED = "order.status_changed"
+ORDER_ITEMS_CHANGED = "order.items_changed"
+ORDER_DELETED = "order.deleted"
+
+
+def _value(v: Any) -> Any:
+    if isinstance(v, datetime):
+        return v.isoformat()
+    return getattr(v, "value", v)
+
+
+def order_snapshot(order: Any) -> dict:
+    """
+    The fields a kitchen/admin board needs, from an OrderModel or a row with
+    the same attribute names (e.g. recalc_order_totals' RETURNING row).
+    """
+    return {
+        "id": order.id,
+        "order_no": order.order_no,
+        "table_id": order.table_id,
+        "status": _value(order.status),
+        "payment_status": _value(order.payment_status),
+        "total_amount": order.total_amount,
+        "updated_at": _value(order.updated_at),
+    }
+
+
+@dataclass(frozen=True)
+class OrderEvent:
+    type: str
+    order: dict
+    previous_status: Optional[str] = None
+    extra: dict = field(default_factory=dict)
+
+    def to_json(self) -> str:
+        payload = {"type": self.type, "order": self.order, **self.extra}
+        if self.previous_status is not None:
+            payload["previous_status"] = self.previous_status
+        return json.dumps(payload, separators=(",", ":"))
+
+
+class Subscription:
+    """
+    One connected client: its filters and a bounded queue. A client that
+    falls a full queue behind is dropped rather than allowed to grow it.
+    """
+
+    def __init__(self, statuses: set[str] | None, table_ids: set[str] | None):
+        self.statuses = statuses
+        self.table_ids = table_ids
+        self.queue: asyncio.Queue[OrderEvent | None] = asyncio.Queue(maxsize=ORDER_EVENTS_QUEUE_SIZE)
+        self.closed = False
+
+    def wants(self, event: OrderEvent) -> bool:
+        if self.table_ids is not None and event.order.get("table_id") not in self.table_ids:
+            return False
+        if self.statuses is not None:
+            # also tell a "PENDING" board that an order just left PENDING
+            return event.order.get("status") in self.statuses or event.previous_status in self.statuses
+        return True
+
+    async def next(self, timeout: float) -> OrderEvent | None:
+        """
+        Next event, or None on keep-alive timeout. Raises ConnectionError
+        once the subscription was dropped.
+        """
+        if self.closed and self.queue.empty():
+            raise ConnectionError("subscription closed")
+        try:
+            event = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if event is None:
+            raise ConnectionError("subscription closed")
+        return event
+
+
+class OrderBroadcaster:
+    """
+    In-process fan-out of order events to connected feeds. Publishing never
+    waits on a client. Only reaches clients of this worker process.
+    """
+
+    def __init__(self):
+        self._subscribers: set[Subscription] = set()
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, statuses: set[str] | None = None, table_ids: set[str] | None = None) -> Subscription:
+        sub = Subscription(statuses, table_ids)
+        self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        self._subscribers.discard(sub)
+        sub.closed = True
+
+    def _close(self, sub: Subscription) -> None:
+        # discard what is queued so the closing sentinel always fits
+        self.unsubscribe(sub)
+        while not sub.queue.empty():
+            sub.queue.get_nowait()
+        sub.queue.put_nowait(None)
+
+    def publish(self, event: OrderEvent) -> None:
+        self.published += 1
+        for sub in list(self._subscribers):
+            if not sub.wants(event):
+                continue
+            try:
+                sub.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                print("Order feed subscriber too slow; dropped")
+                self.dropped += 1
+                self._close(sub)
+
+    def close_all(self) -> None:
+        for sub in list(self._subscribers):
+            self._close(sub)
+
+    def snapshot(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "dropped": self.dropped,
+        }
+
+
+order_events = OrderBroadcaster()
+
+
+def publish_order_event(
+    event_type: str,
+    order: Any,
+    previous_status: Any = None,
+    **extra: Any,
+) -> None:
+    """
+    Publish after the write has committed.
+    """
+    order_events.publish(
+        OrderEvent(
+            type=event_type,
+            order=order_snapshot(order),
+            previous_status=_value(previous_status),
+            extra=extra,
+        )
+    )
@@ -1,5 +1,5 @@
 from core.db import Base
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Enum, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -8,6 +8,13 @@ from api.orders.enums import OrderStatus, PaymentMethod, PaymentStatus
 
 class OrderModel(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        # Keyset pagination for GET /order: (created_at, id) DESC, optionally
+        # narrowed by status or table.
+        Index("ix_orders_created_at_id", "created_at", "id"),
+        Index("ix_orders_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_orders_table_id_created_at_id", "table_id", "created_at", "id"),
+    )
 
     id = Column(String, primary_key=True, index=True)
 
@@ -31,4 +38,17 @@ class OrderModel(Base):
 
     # Optional relationships (recommended)
     table = relationship("TableModel", back_populates="orders")
-    telegram_user = relationship("Telegram_user", back_populates="orders")
\ No newline at end of file
+    telegram_user = relationship("Telegram_user", back_populates="orders")
+
+    # Read-only: items are written through api/order_items, never via this collection.
+    items = relationship("OrderItemModel", viewonly=True, order_by="OrderItemModel.id")
+
+
+class OrderCounterModel(Base):
+    """
+    One row per day; `last_value` is the last order sequence handed out.
+    """
+    __tablename__ = "order_counters"
+
+    day        = Column(String(8), primary_key=True)
+    last_value = Column(Integer, nullable=False, default=0)
\ No newline at end of file
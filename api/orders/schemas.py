@@ -29,4 +29,17 @@ class OrderUpdate(BaseModel):
     subtotal_amount: Optional[int] = Field(None, ge=0)
     total_amount: Optional[int] = Field(None, ge=0)
 
-    note: Optional[str] = None
\ No newline at end of file
+    note: Optional[str] = None
+
+class CheckoutItem(BaseModel):
+    product_id: str = Field(..., min_length=1)
+    qty: int = Field(..., gt=0)
+
+
+class OrderCheckout(BaseModel):
+    id: Optional[str] = Field(None, min_length=1)
+    table_id: str = Field(..., min_length=1)
+    telegram_user_id: str = Field(..., min_length=1)
+    payment_method: PaymentMethod = PaymentMethod.COD
+    note: Optional[str] = None
+    items: list[CheckoutItem] = Field(..., min_length=1)
@@ -1,38 +1,87 @@
-from fastapi import Depends, Form, HTTPException
-from sqlalchemy.orm import Session
+import uuid
+from fastapi import Depends, Form, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import insert, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime
+from deps.auth import authenticate_token, bearer
 from deps.permissions import AdminOnly
 from main import app
-from core.db import get_db
+from core.db import Session, get_async_db
+from api.common.dialect import dialect_insert
+from api.common.integrity import commit_or_conflict, unique_conflicts
+from api.common.pagination import decode_time_cursor, set_next_cursor
 from api.orders import models as order_models
 from api.orders.enums import OrderStatus, PaymentMethod, PaymentStatus
+from api.orders.events import (
+    ORDER_CREATED,
+    ORDER_DELETED,
+    ORDER_EVENTS_KEEPALIVE,
+    ORDER_STATUS_CHANGED,
+    ORDER_UPDATED,
+    order_events,
+    publish_order_event,
+)
+from api.orders.schemas import OrderCheckout
+from api.order_items import models as item_models
+from api.products import models as product_models
+from api.public.order_cache import invalidate_public_order
 from api.tables import models as table_models
 from api.telegram_users import models as tg_models
 
+ORDER_CONFLICTS = {
+    "id"      : "Order id already exists",
+    "order_no": "Order number already exists",
+}
 
-def generate_order_no(db: Session) -> str:
+async def generate_order_no(db: AsyncSession, now: datetime | None = None) -> str:
     """
     Format: ORD-YYYYMMDD-0001
+
+    The per-day counter is bumped with a single INSERT ... ON CONFLICT DO UPDATE
+    ... RETURNING, so concurrent orders never read the same value. Only the
+    order that creates the day's row (and so holds its lock until commit)
+    seeds it from order numbers already written that day, e.g. before the
+    counter existed. Pass the order's `created_at` as `now` so both agree on
+    the day.
     """
-    today = datetime.utcnow().strftime("%Y%m%d")
+    now = now or datetime.utcnow()
+    today = now.strftime("%Y%m%d")
     prefix = f"ORD-{today}-"
-
-    last = (
-        db.query(order_models.OrderModel)
-        .filter(order_models.OrderModel.order_no.like(prefix + "%"))
-        .order_by(order_models.OrderModel.order_no.desc())
-        .first()
+    counter = order_models.OrderCounterModel.__table__
+
+    insert = dialect_insert(db)
+    stmt = (
+        insert(counter)
+        .values(day=today, last_value=1)
+        .on_conflict_do_update(
+            index_elements=[counter.c.day],
+            set_={"last_value": counter.c.last_value + 1},
+        )
+        .returning(counter.c.last_value)
     )
+    seq = (await db.execute(stmt)).scalar_one()
 
-    if not last:
-        return f"{prefix}0001"
-
-    try:
-        last_seq = int(last.order_no.split("-")[-1])
-    except Exception:
+    if seq == 1:
+        result = await db.execute(
+            select(order_models.OrderModel.order_no)
+            .where(order_models.OrderModel.order_no.like(prefix + "%"))
+        )
         last_seq = 0
+        for order_no in result.scalars():
+            try:
+                last_seq = max(last_seq, int(order_no.split("-")[-1]))
+            except ValueError:
+                continue
+        if last_seq:
+            seq = last_seq + 1
+            await db.execute(
+                update(counter).where(counter.c.day == today).values(last_value=seq)
+            )
 
-    return f"{prefix}{last_seq + 1:04d}"
+    return f"{prefix}{seq:04d}"
 
 
 @app.post("/order", tags=["Order"])
@@ -42,11 +91,11 @@ async def create_order(
     telegram_user_id: str           = Form(...),
     payment_method  : PaymentMethod = Form(PaymentMethod.COD),
     note            : str | None    = Form(None),
-    db              : Session       = Depends(get_db),
+    db              : AsyncSession  = Depends(get_async_db),
     _=AdminOnly,
 ):
     # Check table exists
-    table = db.query(table_models.TableModel).filter(table_models.TableModel.id == table_id).first()
+    table = await db.get(table_models.TableModel, table_id)
     if not table:
         raise HTTPException(
             status_code=404, 
@@ -54,23 +103,15 @@ async def create_order(
         )
 
     # Check telegram user exists
-    tg_user = db.query(tg_models.Telegram_user).filter(tg_models.Telegram_user.id == telegram_user_id).first()
+    tg_user = await db.get(tg_models.Telegram_user, telegram_user_id)
     if not tg_user:
         raise HTTPException(
             status_code=404, 
             detail=f"Telegram user {telegram_user_id} not found"
         )
 
-    # Prevent duplicate id
-    exists = db.query(order_models.OrderModel).filter(order_models.OrderModel.id == id).first()
-    if exists:
-        raise HTTPException(
-            status_code=409, 
-            detail="Order id already exists"
-        )
-
     now = datetime.utcnow()
-    order_no = generate_order_no(db)
+    order_no = await generate_order_no(db, now)
 
     new_order = order_models.OrderModel(
         id               = id,
@@ -88,51 +129,161 @@ async def create_order(
     )
 
     db.add(new_order)
-    db.commit()
-    db.refresh(new_order)
+    await commit_or_conflict(db, ORDER_CONFLICTS)
+    await db.refresh(new_order)
+    publish_order_event(ORDER_CREATED, new_order)
     return new_order
 
 
+@app.post("/order/checkout", tags=["Order"])
+async def checkout_order(
+    payload: OrderCheckout,
+    db     : AsyncSession = Depends(get_async_db),
+    _=AdminOnly,
+):
+    """
+    Create an order together with all of its items in one request: one IN
+    query for the products, one bulk insert for the items, one commit.
+    """
+    table = await db.get(table_models.TableModel, payload.table_id)
+    if not table:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Table {payload.table_id} not found"
+        )
+
+    tg_user = await db.get(tg_models.Telegram_user, payload.telegram_user_id)
+    if not tg_user:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Telegram user {payload.telegram_user_id} not found"
+        )
+
+    order_id = payload.id or str(uuid.uuid4())
+
+    product_ids = {line.product_id for line in payload.items}
+    result = await db.execute(
+        select(product_models.ProductModel).where(product_models.ProductModel.id.in_(product_ids))
+    )
+    products = {p.id: p for p in result.scalars().all()}
+
+    missing = sorted(product_ids - products.keys())
+    if missing:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Product {', '.join(missing)} not found"
+        )
+
+    inactive = sorted(pid for pid, p in products.items() if p.is_active is False)
+    if inactive:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Product {', '.join(inactive)} is inactive"
+        )
+
+    item_rows = []
+    for line in payload.items:
+        product = products[line.product_id]
+        item_rows.append({
+            "id"             : str(uuid.uuid4()),
+            "order_id"       : order_id,
+            "product_id"     : product.id,
+            "product_name"   : product.name,
+            "product_name_lc": product.name_lc,
+            "unit_price_usd" : product.price_usd,
+            "unit_price_khr" : product.price_khr,
+            "qty"            : line.qty,
+            "line_total_usd" : product.price_usd * line.qty,
+            "line_total_khr" : product.price_khr * line.qty,
+        })
+
+    # Totals in KHR, same as recalc_order_totals.
+    subtotal_khr = sum(row["line_total_khr"] for row in item_rows)
+
+    now = datetime.utcnow()
+    new_order = order_models.OrderModel(
+        id               = order_id,
+        order_no         = await generate_order_no(db, now),
+        table_id         = payload.table_id,
+        telegram_user_id = payload.telegram_user_id,
+        status           = OrderStatus.PENDING,
+        payment_method   = payload.payment_method,
+        payment_status   = PaymentStatus.UNPAID,
+        subtotal_amount  = subtotal_khr,
+        total_amount     = subtotal_khr,
+        note             = payload.note,
+        created_at       = now,
+        updated_at       = now,
+    )
+
+    db.add(new_order)
+    async with unique_conflicts(db, ORDER_CONFLICTS):
+        # The order is autoflushed ahead of this executemany insert.
+        await db.execute(insert(item_models.OrderItemModel), item_rows)
+        await db.commit()
+    publish_order_event(ORDER_CREATED, new_order, items=len(item_rows))
+
+    return {
+        "order": new_order,
+        "items": item_rows,
+    }
+
+
 @app.get("/order", tags=["Order"])
 async def get_all_orders(
+    response      : Response,
     skip          : int                  = 0,
     limit         : int                  = 10,
     status        : OrderStatus | None   = None,
     payment_method: PaymentMethod | None = None,
     payment_status: PaymentStatus | None = None,
     table_id      : str | None           = None,
-    db            : Session              = Depends(get_db),
+    after         : str | None           = None,
+    db            : AsyncSession         = Depends(get_async_db),
     _=AdminOnly,
 ):
-    q = db.query(order_models.OrderModel)
+    """
+    Pass the `X-Next-Cursor` header of a page as `after` to get the next one;
+    unlike `skip`, this costs the same on every page.
+    """
+    q = select(order_models.OrderModel)
 
     if status is not None:
-        q = q.filter(order_models.OrderModel.status == status)
+        q = q.where(order_models.OrderModel.status == status)
 
     if payment_method is not None:
-        q = q.filter(order_models.OrderModel.payment_method == payment_method)
+        q = q.where(order_models.OrderModel.payment_method == payment_method)
 
     if payment_status is not None:
-        q = q.filter(order_models.OrderModel.payment_status == payment_status)
+        q = q.where(order_models.OrderModel.payment_status == payment_status)
 
     if table_id is not None:
-        q = q.filter(order_models.OrderModel.table_id == table_id)
+        q = q.where(order_models.OrderModel.table_id == table_id)
 
-    orders = (
-        q.order_by(order_models.OrderModel.created_at.desc())
-        .offset(skip)
+    if after is not None:
+        after_created_at, after_id = decode_time_cursor(after)
+        q = q.where(
+            tuple_(order_models.OrderModel.created_at, order_models.OrderModel.id)
+            < tuple_(after_created_at, after_id)
+        )
+    elif skip:
+        q = q.offset(skip)
+
+    result = await db.execute(
+        q.order_by(order_models.OrderModel.created_at.desc(), order_models.OrderModel.id.desc())
         .limit(limit)
-        .all()
     )
+    orders = result.scalars().all()
+    set_next_cursor(response, orders, limit, "created_at", "id")
     return orders
 
 @app.get("/order/{order_id}", tags=["Order"])
 async def get_order_by_id(
     order_id: str,
-    db      : Session = Depends(get_db),
+    db      : AsyncSession = Depends(get_async_db),
     _=AdminOnly,
 ):
-    order = db.query(order_models.OrderModel).filter(order_models.OrderModel.id == order_id).first()
+    order = await db.get(order_models.OrderModel, order_id)
     if not order:
         raise HTTPException(
             status_code=404, 
@@ -150,16 +301,17 @@ async def update_order(
     subtotal_amount: int | None = Form(None),
     total_amount   : int | None = Form(None),
     note           : str | None = Form(None),
-    db             : Session = Depends(get_db),
+    db             : AsyncSession = Depends(get_async_db),
     _=AdminOnly,
 ):
-    order = db.query(order_models.OrderModel).filter(order_models.OrderModel.id == order_id).first()
+    order = await db.get(order_models.OrderModel, order_id)
     if not order:
         raise HTTPException(
             status_code=404, 
             detail=f"Order {order_id} not found"
         )
 
+    previous_status = order.status
     if status is not None:
         order.status = status
 
@@ -190,26 +342,143 @@ async def update_order(
 
     order.updated_at = datetime.utcnow()
 
-    db.commit()
-    db.refresh(order)
+    await db.commit()
+    invalidate_public_order(order_id)
+    await db.refresh(order)
+    if order.status != previous_status:
+        publish_order_event(ORDER_STATUS_CHANGED, order, previous_status)
+    else:
+        publish_order_event(ORDER_UPDATED, order)
     return order
 
 @app.delete("/order/{order_id}", tags=["Order"])
 async def delete_order(
     order_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     _=AdminOnly,
 ):
-    order = db.query(order_models.OrderModel).filter(order_models.OrderModel.id == order_id).first()
+    order = await db.get(order_models.OrderModel, order_id)
     if not order:
         raise HTTPException(
             status_code=404, 
             detail=f"Order {order_id} not found"
         )
 
-    db.delete(order)
-    db.commit()
+    await db.delete(order)
+    await db.commit()
+    invalidate_public_order(order_id)
+    publish_order_event(ORDER_DELETED, order)
     return {
         "message": "Delete successfully", 
         "id": order_id
     }
+
+
+def _feed_admin(token: str | None) -> None:
+    if not token:
+        raise HTTPException(status_code=401, detail="Missing token")
+    with Session() as db:
+        user = authenticate_token(db, token)
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin only")
+
+
+def _feed_filters(status: str | None, table_id: str | None) -> tuple[set[str] | None, set[str] | None]:
+    """
+    `status` and `table_id` are comma-separated lists; omitted means all.
+    """
+    statuses = None
+    if status:
+        statuses = {s.strip().upper() for s in status.split(",") if s.strip()}
+        unknown = statuses - {s.value for s in OrderStatus}
+        if unknown:
+            raise HTTPException(
+                status_code=422,
+                detail=f"Unknown status {', '.join(sorted(unknown))}"
+            )
+    table_ids = None
+    if table_id:
+        table_ids = {t.strip() for t in table_id.split(",") if t.strip()}
+    return statuses, table_ids
+
+
+@app.on_event("shutdown")
+async def close_order_feeds() -> None:
+    order_events.close_all()
+
+
+@app.websocket("/ws/orders")
+async def order_feed_ws(
+    websocket: WebSocket,
+    token    : str | None = None,
+    status   : str | None = None,
+    table_id : str | None = None,
+):
+    """
+    Live order events as JSON text frames. Browsers cannot set headers on a
+    WebSocket, so the admin token comes as `?token=`.
+    """
+    try:
+        await run_in_threadpool(_feed_admin, token)
+        statuses, table_ids = _feed_filters(status, table_id)
+    except HTTPException as exc:
+        await websocket.close(code=1008, reason=str(exc.detail))
+        return
+
+    await websocket.accept()
+    sub = order_events.subscribe(statuses, table_ids)
+    try:
+        while True:
+            event = await sub.next(ORDER_EVENTS_KEEPALIVE)
+            await websocket.send_text(event.to_json() if event else '{"type":"ping"}')
+    except ConnectionError:
+        # fell too far behind (or shutting down); the client reconnects
+        await websocket.close(code=1013)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        order_events.unsubscribe(sub)
+
+
+@app.get("/orders/stream", tags=["Order"])
+async def order_feed_sse(
+    request : Request,
+    status  : str | None = None,
+    table_id: str | None = None,
+    token   : str | None = None,
+    cred    : HTTPAuthorizationCredentials | None = Depends(bearer),
+):
+    """
+    The same feed as /ws/orders as Server-Sent Events. EventSource cannot
+    send headers either, so `?token=` is accepted besides a bearer token.
+    """
+    await run_in_threadpool(_feed_admin, cred.credentials if cred else token)
+    statuses, table_ids = _feed_filters(status, table_id)
+
+    async def events():
+        sub = order_events.subscribe(statuses, table_ids)
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                event = await sub.next(ORDER_EVENTS_KEEPALIVE)
+                if event is None:
+                    if await request.is_disconnected():
+                        return
+                    yield ": ping\n\n"
+                    continue
+                yield f"event: {event.type}\ndata: {event.to_json()}\n\n"
+        except ConnectionError:
+            return
+        finally:
+            order_events.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/orders/stream/stats", tags=["Order"], dependencies=[AdminOnly])
+async def order_feed_stats() -> dict:
+    return order_events.snapshot()
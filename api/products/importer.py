@@ -0,0 +1,349 @@
+import codecs
+import csv
+import hashlib
+import json
+import os
+import uuid
+import zipfile
+from typing import IO, Iterator, Optional
+
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import func, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from api.categories.models import CategoriesModel
+from api.common.dialect import dialect_insert
+from api.common.parsing import parse_bool
+from api.products.models import ProductModel
+from api.products.storage import UPLOAD_DIR, UPLOAD_MAX_BYTES, detect_image_type
+
+IMPORT_BATCH_SIZE = int(os.getenv("PRODUCT_IMPORT_BATCH_SIZE", "500"))
+
+IMPORT_FORMATS = {
+    ".csv": "csv",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+}
+
+
+def detect_import_format(upload: UploadFile, format: Optional[str]) -> str:
+    if format:
+        fmt = format.strip().lower()
+    else:
+        _, ext = os.path.splitext(upload.filename or "")
+        fmt = IMPORT_FORMATS.get(ext.lower())
+        if fmt is None and upload.content_type in ("application/x-ndjson", "application/jsonl"):
+            fmt = "ndjson"
+        if fmt is None and upload.content_type == "text/csv":
+            fmt = "csv"
+
+    if fmt not in ("csv", "ndjson"):
+        raise HTTPException(
+            status_code=422,
+            detail="format must be csv or ndjson"
+        )
+    return fmt
+
+
+def iter_records(file: IO[bytes], fmt: str) -> Iterator[tuple[int, dict | str]]:
+    """
+    Yield (row_no, record) one line at a time; a row that cannot be parsed
+    yields its error message instead of a dict.
+    """
+    text = codecs.getreader("utf-8-sig")(file, errors="replace")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for row_no, row in enumerate(reader, start=2):  # row 1 is the header
+            yield row_no, {k.strip(): v for k, v in row.items() if k}
+        return
+
+    for row_no, line in enumerate(text, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield row_no, f"Invalid JSON: {exc}"
+            continue
+        if not isinstance(record, dict):
+            yield row_no, "Each line must be a JSON object"
+            continue
+        yield row_no, record
+
+
+def next_batch(records: Iterator, size: int) -> list:
+    batch = []
+    for item in records:
+        batch.append(item)
+        if len(batch) >= size:
+            break
+    return batch
+
+
+def _text(record: dict, key: str) -> Optional[str]:
+    value = record.get(key)
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _price(record: dict, key: str) -> int:
+    value = _text(record, key)
+    if value is None:
+        raise ValueError(f"{key} is required")
+    try:
+        price = int(value)
+    except ValueError:
+        raise ValueError(f"{key} must be an integer") from None
+    if price < 0:
+        raise ValueError(f"{key} must be >= 0")
+    return price
+
+
+def validate_record(record: dict, category_ids: set[str]) -> dict:
+    """
+    Turn one input record into a products row; ValueError explains why not.
+    """
+    product_id = _text(record, "id")
+    if not product_id:
+        raise ValueError("id is required")
+
+    name = _text(record, "name")
+    if not name:
+        raise ValueError("name is required")
+
+    category_id = _text(record, "category_id")
+    if category_id not in category_ids:
+        raise ValueError(f"Category {category_id} not found")
+
+    is_active = True
+    if _text(record, "is_active") is not None:
+        is_active = parse_bool(record["is_active"])
+        if is_active is None:
+            raise ValueError("is_active must be true/false")
+
+    return {
+        "id": product_id,
+        "category_id": category_id,
+        "name": name,
+        "name_lc": _text(record, "name_lc"),
+        "price_usd": _price(record, "price_usd"),
+        "price_khr": _price(record, "price_khr"),
+        "is_active": is_active,
+        "image_url": None,
+        "_image": _text(record, "image"),
+    }
+
+
+class ImageArchive:
+    """
+    Images for an import, looked up by their path (or bare file name) inside
+    the uploaded ZIP. Each one is stored the same way as a regular upload:
+    content-addressed under UPLOAD_DIR.
+    """
+
+    def __init__(self, file: IO[bytes]):
+        try:
+            self._zip = zipfile.ZipFile(file)
+        except zipfile.BadZipFile:
+            raise HTTPException(
+                status_code=400,
+                detail="images must be a ZIP archive"
+            ) from None
+
+        self._members: dict[str, zipfile.ZipInfo] = {}
+        for info in self._zip.infolist():
+            if info.is_dir():
+                continue
+            self._members.setdefault(info.filename, info)
+            self._members.setdefault(os.path.basename(info.filename), info)
+        self._saved: dict[str, str] = {}
+
+    def save(self, name: str) -> str:
+        """
+        Blocking; returns the public URL of the stored image.
+        """
+        if name in self._saved:
+            return self._saved[name]
+
+        info = self._members.get(name)
+        if info is None:
+            raise ValueError(f"Image {name} not found in archive")
+        if info.file_size > UPLOAD_MAX_BYTES:
+            raise ValueError(f"Image {name} is larger than {UPLOAD_MAX_BYTES / (1024 * 1024):g} MB")
+
+        digest = hashlib.sha256()
+        tmp_path = os.path.join(UPLOAD_DIR, f".{uuid.uuid4()}.part")
+        try:
+            with self._zip.open(info) as src, open(tmp_path, "wb") as dst:
+                head = src.read(64)
+                ext = detect_image_type(head)
+                if ext is None:
+                    raise ValueError(f"Image {name} is not a jpg/png/webp")
+                chunk = head
+                while chunk:
+                    digest.update(chunk)
+                    dst.write(chunk)
+                    chunk = src.read(1024 * 1024)
+            filename = f"{digest.hexdigest()}.{ext}"
+            os.replace(tmp_path, os.path.join(UPLOAD_DIR, filename))
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+        url = f"/static/images/{filename}"
+        self._saved[name] = url
+        return url
+
+    def attach(self, rows: list[tuple[int, dict]], errors: list[dict]) -> list[tuple[int, dict]]:
+        """
+        Store the images referenced by `rows`; rows whose image is unusable
+        move to `errors`.
+        """
+        kept = []
+        for row_no, row in rows:
+            if row["_image"]:
+                try:
+                    row["image_url"] = self.save(row["_image"])
+                except (ValueError, zipfile.BadZipFile) as exc:
+                    errors.append({"row": row_no, "id": row["id"], "error": str(exc)})
+                    continue
+            kept.append((row_no, row))
+        return kept
+
+    def close(self) -> None:
+        self._zip.close()
+
+
+async def upsert_products(db: AsyncSession, rows: list[dict]) -> dict[str, Optional[str]]:
+    """
+    INSERT ... ON CONFLICT (id) DO UPDATE for one batch, then commit.
+    A missing image or name_lc keeps the stored one. Returns the image_url
+    each updated product had before, so replaced files can be released.
+    """
+    image_ids = [row["id"] for row in rows if row["image_url"]]
+    previous: dict[str, Optional[str]] = {}
+    if image_ids:
+        result = await db.execute(
+            select(ProductModel.id, ProductModel.image_url).where(ProductModel.id.in_(image_ids))
+        )
+        previous = dict(result.all())
+
+    insert = dialect_insert(db)
+    stmt = insert(ProductModel).values([{k: v for k, v in row.items() if not k.startswith("_")} for row in rows])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ProductModel.id],
+        set_={
+            "category_id": stmt.excluded.category_id,
+            "name": stmt.excluded.name,
+            "name_lc": func.coalesce(stmt.excluded.name_lc, ProductModel.name_lc),
+            "price_usd": stmt.excluded.price_usd,
+            "price_khr": stmt.excluded.price_khr,
+            "is_active": stmt.excluded.is_active,
+            "image_url": func.coalesce(stmt.excluded.image_url, ProductModel.image_url),
+        },
+    )
+    await db.execute(stmt)
+    await db.commit()
+    return previous
+
+
+async def import_products(
+    db: AsyncSession,
+    upload: UploadFile,
+    fmt: str,
+    images: Optional[UploadFile] = None,
+) -> tuple[dict, set[str], set[str]]:
+    """
+    Stream `upload` through validation and batched upserts. Only one batch
+    is held in memory at a time; parsing and image extraction run in the
+    threadpool. Returns the report (counts plus per-row errors; every input
+    row is either imported or reported), the image URLs now in use and the
+    ones no longer needed: images they replaced, and images extracted for a
+    batch that then failed.
+    """
+    result = await db.execute(select(CategoriesModel.id))
+    category_ids = set(result.scalars().all())
+
+    archive = await run_in_threadpool(ImageArchive, images.file) if images is not None else None
+    records = iter_records(upload.file, fmt)
+
+    imported = 0
+    errors: list[dict] = []
+    new_images: set[str] = set()
+    replaced_images: set[str] = set()
+    unused_images: set[str] = set()
+    try:
+        while True:
+            batch = await run_in_threadpool(next_batch, records, IMPORT_BATCH_SIZE)
+            if not batch:
+                break
+
+            # last occurrence of an id wins; ON CONFLICT cannot touch a row twice
+            valid: dict[str, tuple[int, dict]] = {}
+            superseded: list[tuple[int, dict]] = []
+            for row_no, record in batch:
+                if isinstance(record, str):
+                    errors.append({"row": row_no, "id": None, "error": record})
+                    continue
+                try:
+                    row = validate_record(record, category_ids)
+                except ValueError as exc:
+                    errors.append({"row": row_no, "id": _text(record, "id"), "error": str(exc)})
+                    continue
+                if row["id"] in valid:
+                    superseded.append(valid[row["id"]])
+                valid[row["id"]] = (row_no, row)
+
+            for row_no, row in superseded:
+                errors.append({
+                    "row": row_no,
+                    "id": row["id"],
+                    "error": f"Duplicate id; superseded by row {valid[row['id']][0]}",
+                })
+
+            rows = list(valid.values())
+            if archive is not None:
+                rows = await run_in_threadpool(archive.attach, rows, errors)
+            elif any(row["_image"] for _, row in rows):
+                for row_no, row in rows:
+                    if row["_image"]:
+                        errors.append({"row": row_no, "id": row["id"], "error": "image given but no images archive uploaded"})
+                rows = [(row_no, row) for row_no, row in rows if not row["_image"]]
+            if not rows:
+                continue
+
+            try:
+                previous = await upsert_products(db, [row for _, row in rows])
+            except SQLAlchemyError as exc:
+                await db.rollback()
+                message = str(getattr(exc, "orig", exc))
+                errors.extend({"row": row_no, "id": row["id"], "error": message} for row_no, row in rows)
+                unused_images.update(row["image_url"] for _, row in rows if row["image_url"])
+                continue
+
+            imported += len(rows)
+            for _, row in rows:
+                if row["image_url"]:
+                    new_images.add(row["image_url"])
+                    old = previous.get(row["id"])
+                    if old and old != row["image_url"]:
+                        replaced_images.add(old)
+    finally:
+        if archive is not None:
+            await run_in_threadpool(archive.close)
+
+    errors.sort(key=lambda e: e["row"])
+    report = {
+        "imported": imported,
+        "failed": len(errors),
+        "errors": errors,
+    }
+    return report, new_images, (replaced_images | unused_images) - new_images
@@ -1,9 +1,14 @@
 from core.db import Base
-from sqlalchemy import Column, String, Integer, Boolean, ForeignKey
+from sqlalchemy import Column, String, Integer, Boolean, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
 class ProductModel(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        # trigram indexes for /product/search (needs the pg_trgm extension)
+        Index("ix_products_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+        Index("ix_products_name_lc_trgm", "name_lc", postgresql_using="gin", postgresql_ops={"name_lc": "gin_trgm_ops"}),
+    )
 
     id          = Column(String, primary_key=True, index=True)
     category_id = Column(String, ForeignKey("tbl_categoies.id"), nullable=False, index=True)
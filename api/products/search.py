@@ -0,0 +1,224 @@
+import asyncio
+import heapq
+import unicodedata
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+
+from sqlalchemy import case, func, literal, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.products import models
+from core.invalidation import invalidation_bus
+
+# pg_trgm's default `%` threshold, so both backends accept the same matches.
+SIMILARITY_THRESHOLD = 0.3
+PREFIX_BONUS = 1.0
+SUBSTRING_BONUS = 0.5
+
+
+def _words(text: str) -> list[str]:
+    """
+    Lower-cased words, split on anything that is not a letter, mark or digit.
+    Marks are kept so Khmer vowel signs and subscripts stay inside their word.
+    """
+    words, current = [], []
+    for ch in text.lower():
+        if unicodedata.category(ch)[0] in "LMN":
+            current.append(ch)
+        elif current:
+            words.append("".join(current))
+            current = []
+    if current:
+        words.append("".join(current))
+    return words
+
+
+def trigrams(text: str) -> set[str]:
+    """
+    Trigrams the way pg_trgm builds them: each word padded with two spaces in
+    front and one behind.
+    """
+    grams = set()
+    for word in _words(text):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+@dataclass(frozen=True)
+class _Entry:
+    id: str
+    names: tuple[str, ...]
+    gram_counts: tuple[int, ...]
+    is_active: bool
+
+
+class TrigramIndex:
+    """
+    In-memory stand-in for the pg_trgm GIN index, used when the database has
+    no pg_trgm (SQLite test runs). Built lazily from (id, name, name_lc) and
+    dropped by `invalidate()` on every product write.
+    """
+
+    def __init__(self):
+        self._entries: dict[str, _Entry] | None = None
+        # trigram -> [(product_id, index into _Entry.names)]
+        self._postings: dict[str, list[tuple[str, int]]] = {}
+        self._lock = asyncio.Lock()
+
+    def invalidate(self) -> None:
+        self._entries = None
+        self._postings = {}
+
+    async def _ensure(self, db: AsyncSession) -> dict[str, _Entry]:
+        entries = self._entries
+        if entries is not None:
+            return entries
+
+        async with self._lock:
+            if self._entries is not None:
+                return self._entries
+
+            result = await db.execute(
+                select(
+                    models.ProductModel.id,
+                    models.ProductModel.name,
+                    models.ProductModel.name_lc,
+                    models.ProductModel.is_active,
+                )
+            )
+            entries, postings = {}, defaultdict(list)
+            for product_id, name, name_lc, is_active in result.all():
+                names = tuple(n.lower() for n in (name, name_lc) if n)
+                counts = []
+                for idx, n in enumerate(names):
+                    grams = trigrams(n)
+                    counts.append(len(grams))
+                    for gram in grams:
+                        postings[gram].append((product_id, idx))
+                entries[product_id] = _Entry(product_id, names, tuple(counts), bool(is_active))
+
+            self._entries, self._postings = entries, dict(postings)
+            return entries
+
+    async def search(
+        self,
+        db: AsyncSession,
+        q: str,
+        limit: int,
+        is_active: bool | None = None,
+    ) -> list[str]:
+        """
+        Product ids ranked by similarity, with prefix and substring matches
+        boosted so type-ahead works from the first character. Candidates are
+        whatever shares a trigram with `q`; shared counts come straight off
+        the postings, so no per-product set arithmetic is needed.
+        """
+        entries = await self._ensure(db)
+        needle = q.lower()
+        query_grams = trigrams(needle)
+        if not query_grams:
+            return []
+
+        shared = Counter()
+        for gram in query_grams:
+            shared.update(self._postings.get(gram, ()))
+
+        best: dict[str, float] = {}
+        nq = len(query_grams)
+        for (product_id, idx), n in shared.items():
+            score = n / (nq + entries[product_id].gram_counts[idx] - n)
+            if score > best.get(product_id, -1.0):
+                best[product_id] = score
+
+        scored = []
+        for product_id, score in best.items():
+            entry = entries[product_id]
+            if is_active is not None and entry.is_active != is_active:
+                continue
+            if any(name.startswith(needle) for name in entry.names):
+                score += PREFIX_BONUS
+            elif any(needle in name for name in entry.names):
+                score += SUBSTRING_BONUS
+            elif score < SIMILARITY_THRESHOLD:
+                continue
+            scored.append((-score, entry.names[0], product_id))
+
+        return [product_id for _, _, product_id in heapq.nsmallest(limit, scored)]
+
+
+search_index = TrigramIndex()
+
+
+def invalidate_search_index() -> None:
+    search_index.invalidate()
+    invalidation_bus.publish("product_search")
+
+
+invalidation_bus.register("product_search", lambda _: search_index.invalidate())
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+async def _search_postgres(
+    db: AsyncSession,
+    q: str,
+    limit: int,
+    is_active: bool | None,
+) -> list[models.ProductModel]:
+    """
+    `%` and ILIKE on name/name_lc are both served by the gin_trgm_ops indexes;
+    rank is the best similarity plus the same prefix/substring bonus the
+    in-memory index uses.
+    """
+    P = models.ProductModel
+    name_lc = func.coalesce(P.name_lc, "")
+    pattern = _escape_like(q)
+    prefix, substring = f"{pattern}%", f"%{pattern}%"
+
+    rank = (
+        func.greatest(func.similarity(P.name, q), func.similarity(name_lc, q))
+        + case(
+            (or_(P.name.ilike(prefix, escape="\\"), name_lc.ilike(prefix, escape="\\")), literal(PREFIX_BONUS)),
+            (or_(P.name.ilike(substring, escape="\\"), name_lc.ilike(substring, escape="\\")), literal(SUBSTRING_BONUS)),
+            else_=literal(0.0),
+        )
+    ).label("rank")
+
+    stmt = (
+        select(P)
+        .where(
+            or_(
+                P.name.op("%")(q),
+                P.name_lc.op("%")(q),
+                P.name.ilike(substring, escape="\\"),
+                P.name_lc.ilike(substring, escape="\\"),
+            )
+        )
+        .order_by(rank.desc(), P.name)
+        .limit(limit)
+    )
+    if is_active is not None:
+        stmt = stmt.where(P.is_active == is_active)
+
+    result = await db.execute(stmt)
+    return list(result.scalars().all())
+
+
+async def search_products(
+    db: AsyncSession,
+    q: str,
+    limit: int = 20,
+    is_active: bool | None = None,
+) -> list[models.ProductModel]:
+    if db.bind.dialect.name == "postgresql":
+        return await _search_postgres(db, q, limit, is_active)
+
+    ids = await search_index.search(db, q, limit, is_active)
+    if not ids:
+        return []
+    result = await db.execute(select(models.ProductModel).where(models.ProductModel.id.in_(ids)))
+    by_id = {p.id: p for p in result.scalars().all()}
+    return [by_id[product_id] for product_id in ids if product_id in by_id]
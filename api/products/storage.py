@@ -0,0 +1,159 @@
+import asyncio
+import hashlib
+import os
+import time
+import uuid
+from typing import Optional
+
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import func, select
+from starlette.concurrency import run_in_threadpool
+
+from api.products.models import ProductModel
+from api.products.variants import delete_variants
+from core.db import AsyncSessionLocal
+
+UPLOAD_DIR = "static/images"
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(5 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# an image written this recently may belong to an upload that has not
+# committed yet, so releasing it waits
+UPLOAD_RELEASE_GRACE = float(os.getenv("UPLOAD_RELEASE_GRACE", "60"))
+
+# deferred release_image calls, kept referenced until they run
+_deferred_releases: set[asyncio.Task] = set()
+
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+
+def detect_image_type(head: bytes) -> Optional[str]:
+    """
+    File extension from the image's magic bytes; the client's content_type
+    and filename are not trusted.
+    """
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _write_chunk(buffer, digest, chunk: bytes) -> None:
+    digest.update(chunk)
+    buffer.write(chunk)
+
+
+async def save_upload_image(image: UploadFile) -> str:
+    """
+    Stream the upload to a temp file in chunks, off the event loop, then
+    atomically rename it into place. Rejects non-images (400) and files over
+    UPLOAD_MAX_BYTES (413) while streaming.
+
+    Files are named by the SHA-256 of their content, so the same photo
+    uploaded for several products is stored once.
+    """
+    chunk = await image.read(UPLOAD_CHUNK_SIZE)
+    ext = detect_image_type(chunk)
+    if ext is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Only jpg/png/webp images are allowed"
+        )
+
+    tmp_path = os.path.join(UPLOAD_DIR, f".{uuid.uuid4()}.part")
+    digest = hashlib.sha256()
+
+    size = 0
+    buffer = await run_in_threadpool(open, tmp_path, "wb")
+    try:
+        while chunk:
+            size += len(chunk)
+            if size > UPLOAD_MAX_BYTES:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Image must be at most {UPLOAD_MAX_BYTES / (1024 * 1024):g} MB"
+                )
+            await run_in_threadpool(_write_chunk, buffer, digest, chunk)
+            chunk = await image.read(UPLOAD_CHUNK_SIZE)
+        await run_in_threadpool(buffer.close)
+
+        filename = f"{digest.hexdigest()}.{ext}"
+        # Same bytes, same name: replacing an existing copy is harmless.
+        await run_in_threadpool(os.replace, tmp_path, os.path.join(UPLOAD_DIR, filename))
+    except BaseException:
+        buffer.close()
+        await run_in_threadpool(_remove_quietly, tmp_path)
+        raise
+
+    return f"/static/images/{filename}"
+
+
+def _unlink_unless_fresh(image_url: str) -> Optional[float]:
+    """
+    Move the image aside (atomic, so a concurrent upload of the same bytes
+    either lands after this and keeps its new file, or is the file moved),
+    then delete it with its variants unless it was written within
+    UPLOAD_RELEASE_GRACE. A fresh file is put back and the seconds left
+    until it is old enough are returned; None once there is nothing left
+    to do.
+    """
+    local_path = image_url.lstrip("/")
+    released_path = os.path.join(os.path.dirname(local_path), f".{uuid.uuid4()}.released")
+    try:
+        os.rename(local_path, released_path)
+    except FileNotFoundError:
+        return None
+
+    age = time.time() - os.stat(released_path).st_mtime
+    if age < UPLOAD_RELEASE_GRACE:
+        if os.path.exists(local_path):
+            # an identical copy was uploaded meanwhile
+            os.remove(released_path)
+        else:
+            os.replace(released_path, local_path)
+        return UPLOAD_RELEASE_GRACE - age
+
+    os.remove(released_path)
+    delete_variants(image_url)
+    return None
+
+
+async def _release_later(image_url: str, delay: float) -> None:
+    await asyncio.sleep(delay)
+    await release_image(image_url)
+
+
+async def release_image(image_url: Optional[str]) -> None:
+    """
+    Delete a content-addressed image once no product references it any more.
+    Run after the commit that dropped the reference (as a background task).
+
+    Counting references cannot see an upload of the same bytes that has not
+    committed yet, so a recently written file is not deleted: the release
+    is retried once it is older than UPLOAD_RELEASE_GRACE, by which time
+    that upload has committed (and the count keeps the file) or failed.
+    """
+    if not image_url:
+        return
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(func.count()).select_from(ProductModel).where(ProductModel.image_url == image_url)
+        )
+        if result.scalar_one() > 0:
+            return
+
+    retry_in = await run_in_threadpool(_unlink_unless_fresh, image_url)
+    if retry_in is not None:
+        task = asyncio.create_task(_release_later(image_url, retry_in))
+        _deferred_releases.add(task)
+        task.add_done_callback(_deferred_releases.discard)
@@ -0,0 +1,135 @@
+import asyncio
+import os
+import tempfile
+from typing import Optional
+
+# name -> longest edge in px
+VARIANT_SIZES = {"thumb": 160, "card": 480, "full": 1280}
+VARIANT_FORMATS = ("webp", "jpg")
+
+# local image path -> variants being generated (same bytes, same path)
+_pending: dict[str, asyncio.Future] = {}
+
+
+def _local_path(image_url: str) -> str:
+    return image_url.lstrip("/")
+
+
+def _variant_path(local_path: str, name: str, fmt: str) -> str:
+    stem, _ = os.path.splitext(local_path)
+    return f"{stem}_{name}.{fmt}"
+
+
+def _variant_paths(local_path: str) -> list[tuple[str, str, str]]:
+    return [
+        (name, fmt, _variant_path(local_path, name, fmt))
+        for name in VARIANT_SIZES
+        for fmt in VARIANT_FORMATS
+    ]
+
+
+def generate_variants(local_path: str) -> list[str]:
+    """
+    Resize `local_path` into every variant next to it. Runs in a worker
+    process. The last variant is written last, so its presence means the
+    set is complete.
+    """
+    from PIL import Image, ImageOps
+
+    written = []
+    with Image.open(local_path) as source:
+        source = ImageOps.exif_transpose(source)
+        has_alpha = source.mode in ("RGBA", "LA") or "transparency" in source.info
+        rgb = source.convert("RGB")
+        rgba = source.convert("RGBA") if has_alpha else rgb
+
+        for name, fmt, path in _variant_paths(local_path):
+            size = VARIANT_SIZES[name]
+            img = (rgba if fmt == "webp" else rgb).copy()
+            img.thumbnail((size, size), Image.Resampling.LANCZOS)
+
+            fd, tmp_path = tempfile.mkstemp(
+                dir=os.path.dirname(path) or ".",
+                prefix=f".{os.path.basename(path)}.",
+                suffix=".part",
+            )
+            os.close(fd)
+            try:
+                if fmt == "webp":
+                    img.save(tmp_path, "WEBP", quality=80, method=4)
+                else:
+                    img.save(tmp_path, "JPEG", quality=82, optimize=True, progressive=True)
+                os.replace(tmp_path, path)
+            except BaseException:
+                try:
+                    os.remove(tmp_path)
+                except FileNotFoundError:
+                    pass
+                raise
+            written.append(path)
+
+    return written
+
+
+def variant_urls(image_url: Optional[str]) -> Optional[dict]:
+    """
+    {"thumb": {"webp": url, "jpg": url}, ...} once the variants exist, else None.
+    """
+    if not image_url:
+        return None
+    local_path = _local_path(image_url)
+    paths = _variant_paths(local_path)
+    if not os.path.exists(paths[-1][2]):
+        return None
+
+    urls: dict[str, dict[str, str]] = {}
+    for name, fmt, path in paths:
+        urls.setdefault(name, {})[fmt] = "/" + path.replace(os.sep, "/")
+    return urls
+
+
+def delete_variants(image_url: Optional[str]) -> None:
+    if not image_url:
+        return
+    for _, _, path in _variant_paths(_local_path(image_url)):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def schedule_variants(image_url: Optional[str]) -> Optional[asyncio.Future]:
+    """
+    Generate variants for an uploaded image on the process pool without
+    waiting for them. The public menu is rebuilt when they are ready. An
+    image whose variants are already being generated (the same photo
+    uploaded for another product) gets the pending future back.
+    """
+    if not image_url or variant_urls(image_url) is not None:
+        return None
+
+    local_path = _local_path(image_url)
+    pending = _pending.get(local_path)
+    if pending is not None:
+        return pending
+
+    from api.public.menu_cache import invalidate_menu
+    from core.workers import get_process_pool
+
+    future = asyncio.get_running_loop().run_in_executor(
+        get_process_pool(), generate_variants, local_path
+    )
+    _pending[local_path] = future
+
+    def done(f: asyncio.Future) -> None:
+        if _pending.get(local_path) is f:
+            del _pending[local_path]
+        if f.cancelled():
+            return
+        if f.exception() is not None:
+            print(f"Image variants for {image_url} failed: {f.exception()}")
+            return
+        invalidate_menu()
+
+    future.add_done_callback(done)
+    return future
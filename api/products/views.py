@@ -1,60 +1,22 @@
-import os
-import uuid
-import shutil
 from typing import Optional
-from fastapi import Depends, Form, HTTPException, UploadFile, File, Request
-from sqlalchemy.orm import Session
+from fastapi import BackgroundTasks, Depends, Form, HTTPException, UploadFile, File, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..common.parsing import parse_bool
+from api.common.integrity import commit_or_conflict
 from api.products import models
+from api.products.importer import detect_import_format, import_products
+from api.products.search import invalidate_search_index, search_products
+from api.products.storage import release_image, save_upload_image
+from api.products.variants import schedule_variants, variant_urls
 from api.categories import models as category_models
-from core.db import get_db
+from core.db import get_async_db
+from api.public.menu_cache import invalidate_menu
+from api.public.order_cache import invalidate_public_orders
 from deps.permissions import AdminOnly
 from main import app
 
 
-UPLOAD_DIR = "static/images"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
-
-def save_upload_image(image: UploadFile) -> str:
-
-    allowed = {"image/jpeg", "image/png", "image/webp"}
-    if image.content_type not in allowed:
-        raise HTTPException(
-            status_code=400, 
-            detail="Only jpg/png/webp images are allowed"
-        )
-
-    ext = (image.filename or "").split(".")[-1].lower() if image.filename else "jpg"
-    if ext not in ("jpg", "jpeg", "png", "webp"):
-        # fallback based on content type
-        ext = "jpg"
-
-    filename = f"{uuid.uuid4()}.{ext}"
-    file_path = os.path.join(UPLOAD_DIR, filename)
-
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(image.file, buffer)
-
-    return f"/static/images/{filename}"
-
-
-def delete_image_file(image_url: Optional[str]) -> None:
-    """
-    Delete saved image file from disk if exists.
-    image_url example: /static/images/xxx.jpg
-    """
-    if not image_url:
-        return
-
-    local_path = image_url.lstrip("/")
-    if os.path.exists(local_path) and os.path.isfile(local_path):
-        try:
-            os.remove(local_path)
-        except Exception:
-            pass
-
-
 def to_public_url(request: Request, path: Optional[str]) -> Optional[str]:
 
     if not path:
@@ -67,8 +29,10 @@ def to_public_url(request: Request, path: Optional[str]) -> Optional[str]:
 
 def product_to_dict(request: Request, p) -> dict:
     """
-    Return clean JSON dict and convert image_url to full URL.
+    Return clean JSON dict and convert image_url (and its resized variants,
+    once generated) to full URLs.
     """
+    variants = variant_urls(p.image_url)
     return {
         "id": p.id,
         "category_id": p.category_id,
@@ -78,6 +42,10 @@ def product_to_dict(request: Request, p) -> dict:
         "price_khr": p.price_khr,
         "is_active": p.is_active,
         "image_url": to_public_url(request, p.image_url),
+        "image_variants": {
+            name: {fmt: to_public_url(request, url) for fmt, url in formats.items()}
+            for name, formats in variants.items()
+        } if variants else None,
     }
 
 
@@ -92,27 +60,17 @@ async def create_product(
     price_khr  : int = Form(...),
     is_active  : str | None = Form(None),
     image      : UploadFile | None = File(None),
-    db         : Session = Depends(get_db),
+    db         : AsyncSession = Depends(get_async_db),
     _=AdminOnly,
 ):
 
-    category = db.query(category_models.CategoriesModel).filter(
-        category_models.CategoriesModel.id == category_id
-    ).first()
+    category = await db.get(category_models.CategoriesModel, category_id)
     if not category:
         raise HTTPException(
             status_code=404, 
             detail=f"Category {category_id} not found"
         )
 
-
-    exists = db.query(models.ProductModel).filter(models.ProductModel.id == id).first()
-    if exists:
-        raise HTTPException(
-            status_code=409, 
-            detail="Product id already exists"
-        )
-
     if price_usd < 0 or price_khr < 0:
         raise HTTPException(
             status_code=422, 
@@ -121,7 +79,7 @@ async def create_product(
 
     image_url = None
     if image:
-        image_url = save_upload_image(image)
+        image_url = await save_upload_image(image)
 
     new_product = models.ProductModel(
         id          = id,
@@ -135,11 +93,47 @@ async def create_product(
     )
 
     db.add(new_product)
-    db.commit()
-    db.refresh(new_product)
+    try:
+        await commit_or_conflict(db, {"id": "Product id already exists"})
+    except HTTPException:
+        await release_image(image_url)
+        raise
+    invalidate_menu()
+    invalidate_search_index()
+    schedule_variants(image_url)
+    await db.refresh(new_product)
     return product_to_dict(request, new_product)
 
 
+@app.post("/product/import", tags=["Product"])
+async def import_product_file(
+    background_tasks: BackgroundTasks,
+    file            : UploadFile = File(...),
+    images          : UploadFile | None = File(None),
+    format          : str | None = Form(None),
+    db              : AsyncSession = Depends(get_async_db),
+    _=AdminOnly,
+):
+    """
+    Create or update products in bulk from a CSV or NDJSON file (columns:
+    id, category_id, name, name_lc, price_usd, price_khr, is_active, image).
+    `image` names a file inside the optional `images` ZIP. Rows are upserted
+    in batches; bad rows are reported instead of failing the import.
+    """
+    fmt = detect_import_format(file, format)
+    report, new_images, unused_images = await import_products(db, file, fmt, images)
+
+    if report["imported"]:
+        invalidate_menu()
+        invalidate_search_index()
+        invalidate_public_orders()
+    for image_url in new_images:
+        schedule_variants(image_url)
+    for image_url in unused_images:
+        background_tasks.add_task(release_image, image_url)
+    return report
+
+
 @app.get("/product", tags=["Product"])
 async def get_all_products(
     request    : Request,
@@ -147,18 +141,42 @@ async def get_all_products(
     limit      : int = 10,
     category_id: str | None = None,
     is_active  : bool | None = None,
-    db         : Session = Depends(get_db),
+    db         : AsyncSession = Depends(get_async_db),
     _=AdminOnly,
 ):
-    q = db.query(models.ProductModel)
+    q = select(models.ProductModel)
 
     if category_id:
-        q = q.filter(models.ProductModel.category_id == category_id)
+        q = q.where(models.ProductModel.category_id == category_id)
 
     if is_active is not None:
-        q = q.filter(models.ProductModel.is_active == is_active)
+        q = q.where(models.ProductModel.is_active == is_active)
 
-    products = q.offset(skip).limit(limit).all()
+    result = await db.execute(q.offset(skip).limit(limit))
+    products = result.scalars().all()
+    return [product_to_dict(request, p) for p in products]
+
+
+@app.get("/product/search", tags=["Product"])
+async def search_product(
+    request  : Request,
+    q        : str,
+    limit    : int = 20,
+    is_active: bool | None = None,
+    db       : AsyncSession = Depends(get_async_db),
+    _=AdminOnly,
+):
+    """
+    Typo-tolerant search over name and name_lc, best match first. Prefixes
+    rank highest, so it also serves type-ahead.
+    """
+    q = q.strip()
+    if not q:
+        raise HTTPException(
+            status_code=422, 
+            detail="q must not be empty"
+        )
+    products = await search_products(db, q, min(max(limit, 1), 100), is_active)
     return [product_to_dict(request, p) for p in products]
 
 
@@ -166,9 +184,9 @@ async def get_all_products(
 async def get_product_by_id(
     request   : Request,
     product_id: str,
-    db        : Session = Depends(get_db),
+    db        : AsyncSession = Depends(get_async_db),
 ):
-    product = db.query(models.ProductModel).filter(models.ProductModel.id == product_id).first()
+    product = await db.get(models.ProductModel, product_id)
     if not product:
         raise HTTPException(
             status_code=404, 
@@ -179,19 +197,20 @@ async def get_product_by_id(
 
 @app.put("/product/{product_id}", tags=["Product"])
 async def update_product(
-    request    : Request,
-    product_id : str,
-    category_id: str | None = Form(None),
-    name       : str | None = Form(None),
-    name_lc    : str | None = Form(None),
-    price_usd  : int | None = Form(None),
-    price_khr  : int | None = Form(None),
-    is_active  : str | None = Form(None),
-    image      : UploadFile | None = File(None),
-    db         : Session = Depends(get_db),
+    request         : Request,
+    background_tasks: BackgroundTasks,
+    product_id      : str,
+    category_id     : str | None = Form(None),
+    name            : str | None = Form(None),
+    name_lc         : str | None = Form(None),
+    price_usd       : int | None = Form(None),
+    price_khr       : int | None = Form(None),
+    is_active       : str | None = Form(None),
+    image           : UploadFile | None = File(None),
+    db              : AsyncSession = Depends(get_async_db),
     _=AdminOnly,
 ):
-    product = db.query(models.ProductModel).filter(models.ProductModel.id == product_id).first()
+    product = await db.get(models.ProductModel, product_id)
     if not product:
         raise HTTPException(
             status_code=404, 
@@ -199,9 +218,7 @@ async def update_product(
         )
 
     if category_id is not None and category_id != product.category_id:
-        category = db.query(category_models.CategoriesModel).filter(
-            category_models.CategoriesModel.id == category_id
-        ).first()
+        category = await db.get(category_models.CategoriesModel, category_id)
         if not category:
             raise HTTPException(
                 status_code=404, 
@@ -240,32 +257,45 @@ async def update_product(
             )
         product.is_active = parsed
 
+    old_image_url = None
     if image:
-        old = product.image_url
-        product.image_url = save_upload_image(image)
-        delete_image_file(old)
-
-    db.commit()
-    db.refresh(product)
+        old_image_url = product.image_url
+        product.image_url = await save_upload_image(image)
+
+    await db.commit()
+    invalidate_menu()
+    invalidate_search_index()
+    # order details show the product's name (as a fallback) and image
+    if name is not None or name_lc is not None or image:
+        invalidate_public_orders()
+    if image:
+        schedule_variants(product.image_url)
+    background_tasks.add_task(release_image, old_image_url)
+    await db.refresh(product)
     return product_to_dict(request, product)
 
 @app.delete("/product/{product_id}", tags=["Product"])
 async def delete_product(
-    product_id: str,
-    db: Session = Depends(get_db),
+    product_id      : str,
+    background_tasks: BackgroundTasks,
+    db              : AsyncSession = Depends(get_async_db),
     _=AdminOnly,
 ):
-    product = db.query(models.ProductModel).filter(models.ProductModel.id == product_id).first()
+    product = await db.get(models.ProductModel, product_id)
     if not product:
         raise HTTPException(
             status_code=404, 
             detail=f"{product_id} not found"
         )
 
-    delete_image_file(product.image_url)
+    image_url = product.image_url
 
-    db.delete(product)
-    db.commit()
+    await db.delete(product)
+    await db.commit()
+    invalidate_menu()
+    invalidate_search_index()
+    invalidate_public_orders()
+    background_tasks.add_task(release_image, image_url)
     return {
         "message": "Delete successfully", 
         "id": product_id
@@ -0,0 +1,118 @@
+import asyncio
+import gzip
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from starlette.concurrency import run_in_threadpool
+
+from core.invalidation import invalidation_bus
+
+try:
+    import brotli
+except ModuleNotFoundError:  # optional: serve gzip/identity only
+    brotli = None
+
+
+@dataclass(frozen=True)
+class CachedDocument:
+    body: bytes
+    gzip_body: bytes
+    br_body: bytes | None
+    etag: str
+
+    def variant(self, accept_encoding: str | None) -> tuple[bytes, str | None, str]:
+        """
+        Pick the best pre-compressed body for the request.
+        Returns (body, content_encoding, etag).
+        """
+        if self.br_body is not None and _accepts(accept_encoding, "br"):
+            return self.br_body, "br", f'"{self.etag}-br"'
+        if _accepts(accept_encoding, "gzip"):
+            return self.gzip_body, "gzip", f'"{self.etag}-gz"'
+        return self.body, None, f'"{self.etag}"'
+
+    def matches(self, if_none_match: str | None) -> bool:
+        if not if_none_match:
+            return False
+        for tag in if_none_match.split(","):
+            tag = tag.strip().removeprefix("W/").strip('"')
+            if tag == "*" or tag.split("-")[0] == self.etag:
+                return True
+        return False
+
+
+def _accepts(accept_encoding: str | None, coding: str) -> bool:
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() != coding:
+            continue
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    return float(value) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
+
+
+def build_document(payload) -> CachedDocument:
+    """
+    Serialize and pre-compress `payload`. CPU-bound (tens of ms for a full
+    menu), so call it off the event loop. Brotli quality 9 is several times
+    cheaper than 11 for a body only a few percent larger.
+    """
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+    return CachedDocument(
+        body=body,
+        gzip_body=gzip.compress(body, compresslevel=9),
+        br_body=brotli.compress(body, quality=9) if brotli else None,
+        etag=hashlib.sha256(body).hexdigest()[:32],
+    )
+
+
+class DocumentCache:
+    """
+    Holds one pre-serialized, pre-compressed document in memory until it is
+    invalidated. Concurrent misses share a single rebuild.
+    """
+
+    def __init__(self):
+        self._document: CachedDocument | None = None
+        self._version = 0
+        self._lock: asyncio.Lock | None = None
+
+    def invalidate(self) -> None:
+        self._version += 1
+        self._document = None
+
+    async def get(self, builder: Callable[[], Awaitable[object]]) -> CachedDocument:
+        document = self._document
+        if document is not None:
+            return document
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._document is not None:
+                return self._document
+            version = self._version
+            document = await run_in_threadpool(build_document, await builder())
+            # Don't keep a document that was invalidated while building.
+            if version == self._version:
+                self._document = document
+            return document
+
+
+menu_cache = DocumentCache()
+
+
+def invalidate_menu() -> None:
+    menu_cache.invalidate()
+    invalidation_bus.publish("menu")
+
+
+invalidation_bus.register("menu", lambda _: menu_cache.invalidate())
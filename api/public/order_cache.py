@@ -0,0 +1,62 @@
+import os
+from dataclasses import dataclass
+
+from core.cache import TTLCache
+from core.invalidation import invalidation_bus
+
+PUBLIC_ORDER_CACHE_SIZE = int(os.getenv("PUBLIC_ORDER_CACHE_SIZE", "2000"))
+PUBLIC_ORDER_CACHE_TTL = float(os.getenv("PUBLIC_ORDER_CACHE_TTL", "300"))
+
+
+@dataclass(frozen=True)
+class CachedOrderDetail:
+    body: bytes
+    etag: str
+
+
+# order_id -> serialized order detail. Every write path that changes an
+# order, its items, its table or a product it shows evicts the entry.
+public_order_cache = TTLCache(maxsize=PUBLIC_ORDER_CACHE_SIZE, ttl=PUBLIC_ORDER_CACHE_TTL)
+
+# bumped on every eviction; a detail read before an eviction is not stored
+_generation = 0
+
+
+def cache_generation() -> int:
+    """
+    Take before reading an order from the database; pass to
+    store_public_order().
+    """
+    return _generation
+
+
+def store_public_order(order_id: str, cached: CachedOrderDetail, generation: int) -> None:
+    # Don't keep a detail that was invalidated while it was being read.
+    if generation == _generation:
+        public_order_cache.set(order_id, cached)
+
+
+def _evict(order_id: str | None) -> None:
+    global _generation
+    _generation += 1
+    if order_id is None:
+        public_order_cache.clear()
+    else:
+        public_order_cache.pop(order_id)
+
+
+def invalidate_public_order(order_id: str) -> None:
+    _evict(order_id)
+    invalidation_bus.publish("public_order", order_id)
+
+
+def invalidate_public_orders() -> None:
+    """
+    Drop every cached order, e.g. after a table rename or a product edit
+    shows up in all of them.
+    """
+    _evict(None)
+    invalidation_bus.publish("public_order")
+
+
+invalidation_bus.register("public_order", _evict)
@@ -1,13 +1,24 @@
-from fastapi import Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import Depends, Header, HTTPException, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+import hashlib
 import os
-from core.db import get_db
+from core.db import AsyncSessionLocal, get_async_db
 from main import app
 
+from api.categories.models import CategoriesModel
 from api.orders.models import OrderModel
 from api.order_items.models import OrderItemModel
 from api.products.models import ProductModel
-from api.tables.models import TableModel
+from api.products.variants import variant_urls
+from api.public.menu_cache import menu_cache
+from api.public.order_cache import (
+    CachedOrderDetail,
+    cache_generation,
+    public_order_cache,
+    store_public_order,
+)
 from api.public.schemas import PublicOrderDetailOut
 
 APP_BASE_URL = os.getenv("APP_BASE_URL", "").rstrip("/")
@@ -24,36 +35,100 @@ def _abs_url(path: str | None) -> str | None:
     return path
 
 
-@app.get("/public/orders/{order_id}", response_model=PublicOrderDetailOut, tags=["Public"])
-def public_get_order(order_id: str, db: Session = Depends(get_db)):
-    order = db.query(OrderModel).filter(OrderModel.id == order_id).first()
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-
-    table = db.query(TableModel).filter(TableModel.id == order.table_id).first()
-    table_code = getattr(table, "code", None) or str(order.table_id)
-    table_name = getattr(table, "name", None)
-
-    items = db.query(OrderItemModel).filter(OrderItemModel.order_id == order_id).all()
-
-    product_ids = [it.product_id for it in items]
-    products = db.query(ProductModel).filter(ProductModel.id.in_(product_ids)).all() if product_ids else []
-    product_map = {p.id: p for p in products}
-
-    status_value = order.status.value if hasattr(order.status, "value") else str(order.status)
+async def _build_menu() -> dict:
+    """
+    Active categories by short_order, each with its active products.
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(CategoriesModel)
+            .where(CategoriesModel.is_active.is_(True))
+            .order_by(CategoriesModel.short_order.asc().nulls_last(), CategoriesModel.name)
+        )
+        categories = result.scalars().all()
+
+        result = await db.execute(
+            select(ProductModel)
+            .where(
+                ProductModel.is_active.is_(True),
+                ProductModel.category_id.in_([c.id for c in categories]),
+            )
+            .order_by(ProductModel.name)
+        )
+        products = result.scalars().all()
+
+    by_category: dict[str, list[dict]] = {c.id: [] for c in categories}
+    for p in products:
+        variants = variant_urls(p.image_url)
+        by_category[p.category_id].append({
+            "id": p.id,
+            "name": p.name,
+            "name_lc": p.name_lc,
+            "price_usd": p.price_usd,
+            "price_khr": p.price_khr,
+            "image_url": _abs_url(p.image_url),
+            "image_variants": {
+                name: {fmt: _abs_url(url) for fmt, url in formats.items()}
+                for name, formats in variants.items()
+            } if variants else None,
+        })
 
+    return {
+        "categories": [
+            {
+                "id": c.id,
+                "name": c.name,
+                "name_lc": c.name_lc,
+                "short_order": c.short_order,
+                "products": by_category[c.id],
+            }
+            for c in categories
+        ]
+    }
+
+
+@app.get("/public/menu", tags=["Public"])
+async def public_get_menu(
+    accept_encoding: str | None = Header(default=None),
+    if_none_match  : str | None = Header(default=None),
+):
+    """
+    Served from memory; rebuilt only after a product or category write.
+    """
+    document = await menu_cache.get(_build_menu)
+    body, encoding, etag = document.variant(accept_encoding)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "public, no-cache",
+        "Vary": "Accept-Encoding",
+    }
+
+    if document.matches(if_none_match):
+        return Response(status_code=304, headers=headers)
+
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _enum_value(value):
+    return value.value if hasattr(value, "value") else value
+
+
+def _serialize_order_detail(order: OrderModel) -> bytes:
+    table = order.table
     subtotal_usd = 0.0
     item_count = 0
 
     out_items = []
-    for it in items:
-        p = product_map.get(it.product_id)
+    for it in order.items:
+        p = it.product
 
-        qty = int(getattr(it, "qty", 0) or 0)
+        qty = int(it.qty or 0)
         item_count += qty
 
-        unit_usd = float(getattr(it, "unit_price_usd", 0) or 0)
-        line_usd = float(getattr(it, "line_total_usd", unit_usd * qty) or 0)
+        unit_usd = float(it.unit_price_usd or 0)
+        line_usd = float(it.line_total_usd or 0)
 
         # ✅ derive KHR from USD (single source of truth)
         unit_khr = round(unit_usd * USD_TO_KHR)
@@ -64,37 +139,36 @@ def public_get_order(order_id: str, db: Session = Depends(get_db)):
         out_items.append({
             "product": {
                 "id": it.product_id,
-                "name": getattr(it, "product_name", None) or getattr(p, "name", None),
-                "name_lc": getattr(it, "product_name_lc", None) or getattr(p, "name_lc", None),
-                "image_url": _abs_url(getattr(p, "image_url", None)),
+                "name": it.product_name or (p.name if p else None),
+                "name_lc": it.product_name_lc or (p.name_lc if p else None),
+                "image_url": _abs_url(p.image_url if p else None),
             },
             "qty": qty,
             "unit_price": {"usd": unit_usd, "khr": unit_khr},
             "line_total": {"usd": line_usd, "khr": line_khr},
         })
 
-    total_usd = float(getattr(order, "total_amount", subtotal_usd) or subtotal_usd)
+    total_usd = float(order.total_amount or subtotal_usd)
 
     # ✅ summary KHR also derived from USD
     subtotal_khr = round(subtotal_usd * USD_TO_KHR)
     total_khr = round(total_usd * USD_TO_KHR)
 
-    return {
+    detail = PublicOrderDetailOut.model_validate({
         "order": {
             "id": order.id,
-            "order_no": getattr(order, "order_no", None),
-            "status": status_value,
-            "table": {"code": table_code, "name": table_name},
-            "note": getattr(order, "note", None),
+            "order_no": order.order_no,
+            "status": _enum_value(order.status),
+            "table": {
+                "code": (table.code if table else None) or str(order.table_id),
+                "name": table.name if table else None,
+            },
+            "note": order.note,
             "payment": {
-                "method": (getattr(order, "payment_method", None).value
-                           if hasattr(getattr(order, "payment_method", None), "value")
-                           else getattr(order, "payment_method", None)),
-                "status": (getattr(order, "payment_status", None).value
-                           if hasattr(getattr(order, "payment_status", None), "value")
-                           else getattr(order, "payment_status", None)),
+                "method": _enum_value(order.payment_method),
+                "status": _enum_value(order.payment_status),
             },
-            "created_at": getattr(order, "created_at", None),
+            "created_at": order.created_at,
         },
         "items": out_items,
         "summary": {
@@ -102,4 +176,44 @@ def public_get_order(order_id: str, db: Session = Depends(get_db)):
             "subtotal": {"usd": subtotal_usd, "khr": subtotal_khr},
             "total": {"usd": total_usd, "khr": total_khr},
         }
-    }
\ No newline at end of file
+    })
+    return detail.model_dump_json().encode("utf-8")
+
+
+@app.get("/public/orders/{order_id}", response_model=PublicOrderDetailOut, tags=["Public"])
+async def public_get_order(
+    order_id     : str,
+    if_none_match: str | None   = Header(default=None),
+    db           : AsyncSession = Depends(get_async_db),
+):
+    """
+    Polled by the mini-app while the customer waits, so the serialized detail
+    is cached per order and only rebuilt after the order changes. The session
+    only checks out a connection on a cache miss.
+    """
+    cached = public_order_cache.get(order_id)
+    if cached is None:
+        generation = cache_generation()
+        result = await db.execute(
+            select(OrderModel)
+            .options(
+                joinedload(OrderModel.table),
+                joinedload(OrderModel.items).joinedload(OrderItemModel.product),
+            )
+            .where(OrderModel.id == order_id)
+        )
+        order = result.unique().scalars().first()
+        if not order:
+            raise HTTPException(status_code=404, detail="Order not found")
+
+        body = _serialize_order_detail(order)
+        cached = CachedOrderDetail(
+            body=body,
+            etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+        )
+        store_public_order(order_id, cached, generation)
+
+    headers = {"ETag": cached.etag, "Cache-Control": "no-cache"}
+    if if_none_match and cached.etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
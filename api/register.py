@@ -6,4 +6,5 @@ from .orders.views import *
 from .order_items.views import *
 from .admin_user.views import *
 from .public.views import *
-from .telegram.views import *
\ No newline at end of file
+from .telegram.views import *
+from .system.views import *
\ No newline at end of file
@@ -0,0 +1,28 @@
+from fastapi import Header, HTTPException, Response
+
+from core.db import pool_status
+from core.invalidation import invalidation_bus
+from core.metrics import METRICS_TOKEN, render_metrics
+from deps.permissions import AdminOnly
+from main import app
+
+
+@app.get("/system/db/pool", tags=["System"], dependencies=[AdminOnly])
+async def get_db_pool_status() -> dict:
+    return pool_status()
+
+
+@app.get("/system/invalidation", tags=["System"], dependencies=[AdminOnly])
+async def get_invalidation_bus_status() -> dict:
+    return invalidation_bus.snapshot()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics(authorization: str | None = Header(default=None)) -> Response:
+    """
+    Prometheus exposition. Set METRICS_TOKEN to require `Bearer <token>`.
+    """
+    if METRICS_TOKEN and authorization != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
@@ -0,0 +1,251 @@
+import asyncio
+import json
+import os
+import re
+import tempfile
+import time
+
+from core.invalidation import invalidation_bus
+
+QR_SUBDIR = os.path.join("images", "table_qr")
+QR_DIR = os.path.join("static", QR_SUBDIR)
+MANIFEST_PATH = os.path.join(QR_DIR, "manifest.json")
+WARMUP_LOCK_PATH = os.path.join(QR_DIR, ".warmup.lock")
+# renders still unclaimed after this long were orphaned (e.g. by a shutdown)
+ORPHANED_RENDER_AGE = 600
+
+
+def _safe_filename(value: str) -> str:
+    cleaned = re.sub(r"[^a-zA-Z0-9_-]+", "_", value.strip())
+    return cleaned or "table"
+
+
+def _table_qr_filename(table_code: str) -> str:
+    return f"{_safe_filename(table_code)}.png"
+
+
+def _table_qr_file_path(table_code: str) -> str:
+    return os.path.join(QR_DIR, _table_qr_filename(table_code))
+
+
+def _table_qr_public_url(table_code: str) -> str:
+    return f"/static/{QR_SUBDIR}/{_table_qr_filename(table_code)}"
+
+
+def render_qr_png(start_url: str, file_path: str) -> str:
+    """
+    Render a QR for `start_url` to a unique temp file next to `file_path`
+    and return its path. Runs in a worker process; the caller moves it into
+    place (or discards it when the render was superseded).
+    """
+    import qrcode
+
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(file_path),
+        prefix=f".{os.path.basename(file_path)}.",
+        suffix=".part",
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            qrcode.make(start_url).save(f, format="PNG")
+    except BaseException:
+        _remove_quietly(tmp_path)
+        raise
+    return tmp_path
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _try_warmup_lock():
+    """
+    Non-blocking exclusive lock shared by the workers on this host. Returns
+    the open lock file (close it to release), or None if another worker
+    holds it.
+    """
+    import fcntl
+
+    os.makedirs(QR_DIR, exist_ok=True)
+    lock = open(WARMUP_LOCK_PATH, "a")
+    try:
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock.close()
+        return None
+    return lock
+
+
+def _remove_orphaned_renders() -> None:
+    try:
+        names = os.listdir(QR_DIR)
+    except FileNotFoundError:
+        return
+    cutoff = time.time() - ORPHANED_RENDER_AGE
+    for name in names:
+        if name.startswith(".") and name.endswith(".part"):
+            path = os.path.join(QR_DIR, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class QrManifest:
+    """
+    In-memory record of which start URL each table's QR image was rendered
+    for, persisted next to the images. Lookups never touch the filesystem.
+    A table whose start URL changed (e.g. a new TELEGRAM_BOT_USERNAME) is
+    stale and gets re-rendered.
+
+    Saves are coalesced: at most one runs at a time, writing a snapshot of
+    the entries taken on the event loop, and renders that finish meanwhile
+    are written by one follow-up save.
+    """
+
+    def __init__(self, path: str = MANIFEST_PATH):
+        self.path = path
+        self.entries: dict[str, str] = {}
+        self.pending: dict[str, asyncio.Future] = {}
+        self._saving: asyncio.Future | None = None
+        self._save_again = False
+        self._warmup: asyncio.Task | None = None
+
+    def load(self) -> None:
+        _remove_orphaned_renders()
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                entries = json.load(f)
+        except (FileNotFoundError, ValueError):
+            entries = {}
+        self.entries = {
+            code: start_url
+            for code, start_url in entries.items()
+            if os.path.exists(_table_qr_file_path(code))
+        }
+
+    def save(self, entries: dict[str, str] | None = None) -> None:
+        """
+        Blocking. Pass a snapshot when calling off the event loop.
+        """
+        entries = self.entries if entries is None else entries
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.part"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def _schedule_save(self, loop: asyncio.AbstractEventLoop) -> None:
+        if self._saving is not None:
+            self._save_again = True
+            return
+        self._save_again = False
+        snapshot = dict(self.entries)
+        try:
+            saving = loop.run_in_executor(None, self.save, snapshot)
+        except RuntimeError:
+            # the default executor is gone (shutting down): save inline
+            self.save(snapshot)
+            return
+        self._saving = saving
+
+        def saved(f: asyncio.Future) -> None:
+            self._saving = None
+            if not f.cancelled() and f.exception() is not None:
+                print(f"QR manifest save failed: {f.exception()}")
+            else:
+                # other workers pick the new images up from the saved manifest
+                invalidation_bus.publish("table_qr")
+            if self._save_again:
+                self._schedule_save(loop)
+
+        saving.add_done_callback(saved)
+
+    def is_current(self, table_code: str, start_url: str) -> bool:
+        return self.entries.get(table_code) == start_url
+
+    def ensure(self, table_code: str, start_url: str) -> asyncio.Future | None:
+        """
+        Schedule rendering on the process pool unless the image is current.
+        Returns the pending future, or None if there is nothing to do.
+        """
+        if self.is_current(table_code, start_url):
+            return None
+
+        pending = self.pending.get(table_code)
+        if pending is not None and getattr(pending, "start_url", None) == start_url:
+            return pending
+
+        from core.workers import get_process_pool
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            get_process_pool(), render_qr_png, start_url, _table_qr_file_path(table_code)
+        )
+        future.start_url = start_url
+        self.pending[table_code] = future
+
+        def done(f: asyncio.Future) -> None:
+            current = self.pending.get(table_code) is f
+            if current:
+                del self.pending[table_code]
+            if f.cancelled() or f.exception() is not None:
+                if not f.cancelled():
+                    print(f"QR render for {table_code} failed: {f.exception()}")
+                return
+            if not current:
+                # superseded by a render for a newer start URL
+                _remove_quietly(f.result())
+                return
+            try:
+                os.replace(f.result(), _table_qr_file_path(table_code))
+            except OSError as exc:
+                print(f"QR render for {table_code} failed: {exc}")
+                _remove_quietly(f.result())
+                return
+            self.entries[table_code] = start_url
+            self._schedule_save(loop)
+
+        future.add_done_callback(done)
+        return future
+
+
+    def warm_up(self, targets: list[tuple[str, str]]) -> None:
+        """
+        Queue every missing or stale (table_code, start_url) in one worker
+        only: the others skip it while that worker holds the warm-up lock,
+        and pick the images up from the manifest it saves.
+        """
+        lock = _try_warmup_lock()
+        if lock is None:
+            print("Table QR warm-up running in another worker")
+            return
+
+        futures = [
+            future
+            for future in (self.ensure(code, start_url) for code, start_url in targets)
+            if future is not None
+        ]
+
+        async def release_when_rendered() -> None:
+            try:
+                await asyncio.gather(*futures, return_exceptions=True)
+            finally:
+                lock.close()
+
+        self._warmup = asyncio.create_task(release_when_rendered())
+
+    def reload_later(self) -> None:
+        """
+        Re-read the manifest (in the threadpool) after another worker saved it.
+        """
+        asyncio.get_running_loop().run_in_executor(None, self.load)
+
+
+qr_manifest = QrManifest()
+invalidation_bus.register("table_qr", lambda _: qr_manifest.reload_later())
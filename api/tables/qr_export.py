@@ -0,0 +1,232 @@
+import asyncio
+import io
+import zipfile
+import zlib
+from typing import AsyncIterator, Awaitable, Callable, Iterable
+
+from api.tables.qr import _safe_filename
+
+# A4 at 150 dpi, 2 x 3 cards per page.
+SHEET_SIZE = (1240, 1754)
+SHEET_GRID = (2, 3)
+SHEET_MARGIN = 60
+PDF_PAGE_SIZE = (595, 842)  # A4 in points
+
+Card = tuple[str, str, str | None]  # (qr file path, table code, table name)
+
+
+def _label_font(size: int):
+    from PIL import ImageFont
+
+    try:
+        return ImageFont.load_default(size=size)
+    except (TypeError, OSError):
+        return ImageFont.load_default()
+
+
+def _draw_card(card: Card, width: int, height: int):
+    """
+    The table's QR scaled into a width x height tile, code and name below.
+    """
+    from PIL import Image, ImageDraw
+
+    file_path, code, name = card
+    tile = Image.new("L", (width, height), 255)
+    label_height = height // 5
+
+    with Image.open(file_path) as qr:
+        side = min(width, height - label_height)
+        qr = qr.convert("L").resize((side, side), Image.Resampling.NEAREST)
+        tile.paste(qr, ((width - side) // 2, 0))
+
+    draw = ImageDraw.Draw(tile)
+    top = height - label_height
+    for text, size in ((code, label_height // 3), (name or "", label_height // 4)):
+        if not text:
+            continue
+        font = _label_font(size)
+        text_width = draw.textlength(text, font=font)
+        draw.text(((width - text_width) / 2, top), text, fill=0, font=font)
+        top += size + size // 3
+    return tile
+
+
+def render_qr_card_png(card: Card) -> bytes:
+    """
+    One labelled QR card as PNG bytes. Runs in a worker process.
+    """
+    buffer = io.BytesIO()
+    _draw_card(card, 600, 760).save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def render_qr_sheet_page(cards: list[Card]) -> tuple[int, int, bytes]:
+    """
+    One printable A4 page of cards as a Flate-compressed 8-bit grayscale
+    bitmap (ready to embed in a PDF). Runs in a worker process.
+    """
+    from PIL import Image
+
+    width, height = SHEET_SIZE
+    columns, rows = SHEET_GRID
+    cell_w = (width - 2 * SHEET_MARGIN) // columns
+    cell_h = (height - 2 * SHEET_MARGIN) // rows
+
+    page = Image.new("L", SHEET_SIZE, 255)
+    for index, card in enumerate(cards):
+        column, row = index % columns, index // columns
+        tile = _draw_card(card, cell_w - 40, cell_h - 40)
+        page.paste(tile, (SHEET_MARGIN + column * cell_w + 20, SHEET_MARGIN + row * cell_h + 20))
+
+    return width, height, zlib.compress(page.tobytes(), 6)
+
+
+class _StreamBuffer:
+    """
+    Write-only file object whose contents are drained after each entry, so a
+    ZIP can be streamed without holding the whole archive.
+    """
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def _ordered(
+    jobs: Iterable,
+    submit: Callable[..., Awaitable],
+    window: int,
+) -> AsyncIterator:
+    """
+    Run `submit(job)` for every job with at most `window` in flight and yield
+    results in input order.
+    """
+    pending: list[asyncio.Future] = []
+    for job in jobs:
+        pending.append(asyncio.ensure_future(submit(job)))
+        if len(pending) >= window:
+            yield await pending.pop(0)
+    for future in pending:
+        yield await future
+
+
+async def stream_qr_zip(
+    cards: list[Card],
+    run: Callable[..., Awaitable],
+    window: int,
+) -> AsyncIterator[bytes]:
+    buffer = _StreamBuffer()
+    archive = zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_STORED)
+
+    async def render(card: Card):
+        return card[1], await run(render_qr_card_png, card)
+
+    used: set[str] = set()
+    async for code, png in _ordered(cards, render, window):
+        # table codes are user input: no "/" or ".." in entry names
+        stem = name = _safe_filename(code)
+        n = 1
+        while name in used:
+            n += 1
+            name = f"{stem}_{n}"
+        used.add(name)
+        archive.writestr(f"{name}.png", png)
+        yield buffer.drain()
+
+    archive.close()
+    yield buffer.drain()
+
+
+class _PdfWriter:
+    """
+    Minimal incremental PDF writer: one full-page grayscale image per page.
+    Object 1 is the catalog and object 2 the page tree, written last.
+    """
+
+    def __init__(self):
+        self.offset = 0
+        self.offsets: dict[int, int] = {}
+        self.next_id = 3
+        self.page_ids: list[int] = []
+
+    def _object(self, obj_id: int, body: bytes) -> bytes:
+        self.offsets[obj_id] = self.offset
+        data = f"{obj_id} 0 obj\n".encode() + body + b"\nendobj\n"
+        self.offset += len(data)
+        return data
+
+    def _stream(self, obj_id: int, header: str, payload: bytes) -> bytes:
+        return self._object(
+            obj_id,
+            f"<< {header} /Length {len(payload)} >>\nstream\n".encode() + payload + b"\nendstream",
+        )
+
+    def header(self) -> bytes:
+        data = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+        self.offset += len(data)
+        return data
+
+    def page(self, width: int, height: int, flate_pixels: bytes) -> bytes:
+        image_id, content_id, page_id = self.next_id, self.next_id + 1, self.next_id + 2
+        self.next_id += 3
+        self.page_ids.append(page_id)
+        page_w, page_h = PDF_PAGE_SIZE
+
+        content = f"q {page_w} 0 0 {page_h} 0 0 cm /Im0 Do Q".encode()
+        return b"".join([
+            self._stream(
+                image_id,
+                f"/Type /XObject /Subtype /Image /Width {width} /Height {height} "
+                f"/ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /FlateDecode",
+                flate_pixels,
+            ),
+            self._stream(content_id, "", content),
+            self._object(
+                page_id,
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_w} {page_h}] "
+                f"/Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {content_id} 0 R >>".encode(),
+            ),
+        ])
+
+    def trailer(self) -> bytes:
+        kids = " ".join(f"{page_id} 0 R" for page_id in self.page_ids)
+        data = self._object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        data += self._object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>".encode())
+
+        xref_offset = self.offset
+        rows = ["xref", f"0 {self.next_id}", "0000000000 65535 f "]
+        for obj_id in range(1, self.next_id):
+            rows.append(f"{self.offsets[obj_id]:010d} 00000 n ")
+        rows += ["trailer", f"<< /Size {self.next_id} /Root 1 0 R >>", "startxref", str(xref_offset), "%%EOF", ""]
+        return data + "\n".join(rows).encode()
+
+
+async def stream_qr_pdf(
+    cards: list[Card],
+    run: Callable[..., Awaitable],
+    window: int,
+) -> AsyncIterator[bytes]:
+    per_page = SHEET_GRID[0] * SHEET_GRID[1]
+    writer = _PdfWriter()
+    yield writer.header()
+
+    pages = [cards[i:i + per_page] for i in range(0, len(cards), per_page)]
+
+    async def render(page_cards: list[Card]):
+        return await run(render_qr_sheet_page, page_cards)
+
+    async for width, height, pixels in _ordered(pages, render, window):
+        yield writer.page(width, height, pixels)
+
+    yield writer.trailer()
@@ -1,20 +1,34 @@
+import asyncio
 import os
-import re
 from urllib.parse import quote
 
 from ..common.parsing import parse_bool
 from deps.permissions import AdminOnly
 from fastapi import Depends, Form, HTTPException
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
+from api.common.integrity import commit_or_conflict
+from api.public.order_cache import invalidate_public_orders
 from api.tables import models
-from core.db import get_db
+from api.tables.qr import (
+    _table_qr_file_path,
+    _table_qr_filename,
+    _table_qr_public_url,
+    qr_manifest,
+)
+from api.tables.qr_export import stream_qr_pdf, stream_qr_zip
+from core.db import AsyncSessionLocal, get_async_db
+from core.workers import WORKER_PROCESSES, get_process_pool
 from main import app
 
-QR_SUBDIR = os.path.join("images", "table_qr")
-QR_DIR = os.path.join("static", QR_SUBDIR)
-
+TABLE_CONFLICTS = {
+    "id"  : "Table id already exists",
+    "code": "Table code already exists",
+    "name": "Table name already exists",
+}
 
 def _bot_username() -> str:
     username = os.getenv("TELEGRAM_BOT_USERNAME", "").strip()
@@ -23,23 +37,6 @@ def _bot_username() -> str:
     return username
 
 
-def _safe_filename(value: str) -> str:
-    cleaned = re.sub(r"[^a-zA-Z0-9_-]+", "_", value.strip())
-    return cleaned or "table"
-
-
-def _table_qr_filename(table_code: str) -> str:
-    return f"{_safe_filename(table_code)}.png"
-
-
-def _table_qr_file_path(table_code: str) -> str:
-    return os.path.join(QR_DIR, _table_qr_filename(table_code))
-
-
-def _table_qr_public_url(table_code: str) -> str:
-    return f"/static/{QR_SUBDIR}/{_table_qr_filename(table_code)}"
-
-
 def build_telegram_start_url(table_code: str) -> str | None:
     username = _bot_username()
     if not username:
@@ -54,60 +51,81 @@ def build_table_qr_url(table_code: str) -> str | None:
     return _table_qr_public_url(table_code)
 
 
-def ensure_table_qr_image(table_code: str) -> tuple[str, str]:
+def _require_start_url(table_code: str) -> str:
     start_url = build_telegram_start_url(table_code)
     if not start_url:
         raise HTTPException(
             status_code=400,
             detail="TELEGRAM_BOT_USERNAME is required to generate table QR",
         )
+    return start_url
 
-    try:
-        import qrcode
-    except ModuleNotFoundError as exc:
-        raise HTTPException(
-            status_code=500,
-            detail="Missing dependency: qrcode. Install with `pip install qrcode[pil]`.",
-        ) from exc
 
-    os.makedirs(QR_DIR, exist_ok=True)
-    file_path = _table_qr_file_path(table_code)
-    if not os.path.exists(file_path):
-        img = qrcode.make(start_url)
-        img.save(file_path)
+async def ensure_table_qr_image(table_code: str) -> tuple[str, str]:
+    """
+    Make sure the QR image for `table_code` is rendered and current, waiting
+    for the process pool if it has to be (re)generated.
+    """
+    start_url = _require_start_url(table_code)
 
-    return file_path, _table_qr_public_url(table_code)
+    pending = qr_manifest.ensure(table_code, start_url)
+    if pending is not None:
+        try:
+            await pending
+        except ModuleNotFoundError as exc:
+            raise HTTPException(
+                status_code=500,
+                detail="Missing dependency: qrcode. Install with `pip install qrcode[pil]`.",
+            ) from exc
+
+    return _table_qr_file_path(table_code), _table_qr_public_url(table_code)
 
 
 def serialize_table_with_qr(table: models.TableModel) -> dict:
-    _, qr_public_url = ensure_table_qr_image(table.code)
+    """
+    Never blocks: a missing or stale QR is queued for rendering in the
+    background and the (stable) URL is returned right away.
+    """
+    start_url = _require_start_url(table.code)
+    qr_manifest.ensure(table.code, start_url)
     return {
         "id": table.id,
         "code": table.code,
         "name": table.name,
         "is_active": table.is_active,
-        "telegram_start_url": build_telegram_start_url(table.code),
-        "qr_code_url": qr_public_url,
+        "telegram_start_url": start_url,
+        "qr_code_url": _table_qr_public_url(table.code),
     }
 
 
+@app.on_event("startup")
+async def init_table_qr_manifest() -> None:
+    """
+    Load the manifest once, then queue every missing or stale table QR (in
+    one worker; see QrManifest.warm_up).
+    """
+    await run_in_threadpool(qr_manifest.load)
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(models.TableModel.code))
+            codes = result.scalars().all()
+    except Exception as exc:
+        print(f"Table QR warm-up skipped: {exc}")
+        return
+
+    targets = [(code, build_telegram_start_url(code)) for code in codes]
+    qr_manifest.warm_up([(code, start_url) for code, start_url in targets if start_url])
+
+
 @app.post("/table", tags=["Table"])
 async def create_table(
-    id       : str        = Form(...),
-    code     : str        = Form(...),
-    name     : str | None = Form(None),
-    is_active: str | None = Form(None),
-    db       : Session    = Depends(get_db),
+    id       : str          = Form(...),
+    code     : str          = Form(...),
+    name     : str | None   = Form(None),
+    is_active: str | None   = Form(None),
+    db       : AsyncSession = Depends(get_async_db),
     _=AdminOnly,
 ):
-
-    exists = db.query(models.TableModel).filter(models.TableModel.code == code).first()
-    if exists:
-        raise HTTPException(
-            status_code=409, 
-            detail="Table code already exists"
-        )
-
     new_table = models.TableModel(
         id        = id,
         code      = code,
@@ -116,27 +134,28 @@ async def create_table(
     )
 
     db.add(new_table)
-    db.commit()
-    db.refresh(new_table)
+    await commit_or_conflict(db, TABLE_CONFLICTS)
+    await db.refresh(new_table)
     return serialize_table_with_qr(new_table)
 
 @app.get("/table", tags=["Table"])
 async def get_all_table(
-    skip : int     = 0,
-    limit: int     = 10,
-    db   : Session = Depends(get_db),
+    skip : int          = 0,
+    limit: int          = 10,
+    db   : AsyncSession = Depends(get_async_db),
     _=AdminOnly,
 ):
-    tables = db.query(models.TableModel).offset(skip).limit(limit).all()
+    result = await db.execute(select(models.TableModel).offset(skip).limit(limit))
+    tables = result.scalars().all()
     return [serialize_table_with_qr(table) for table in tables]
 
 
 @app.get("/table/{table_id}", tags=["Table"])
 async def get_table_by_id(
     table_id: str,
-    db      : Session = Depends(get_db),
+    db      : AsyncSession = Depends(get_async_db),
 ):
-    table = db.query(models.TableModel).filter(models.TableModel.id == table_id).first()
+    table = await db.get(models.TableModel, table_id)
     if not table:
         raise HTTPException(
             status_code=404, 
@@ -150,23 +169,17 @@ async def update_table(
     code     : str | None = Form(None),
     name     : str | None = Form(None),
     is_active: str | None = Form(None),
-    db       : Session = Depends(get_db),
+    db       : AsyncSession = Depends(get_async_db),
     _=AdminOnly,
 ):
-    table = db.query(models.TableModel).filter(models.TableModel.id == table_id).first()
+    table = await db.get(models.TableModel, table_id)
     if not table:
         raise HTTPException(
             status_code=404, 
             detail=f"{table_id} not found"
         )
 
-    if code is not None and code != table.code:
-        exists = db.query(models.TableModel).filter(models.TableModel.code == code).first()
-        if exists:
-            raise HTTPException(
-                status_code=409, 
-                detail="Table code already exists"
-            )
+    if code is not None:
         table.code = code
 
     if name is not None:
@@ -181,23 +194,73 @@ async def update_table(
             )
         table.is_active = parsed
 
-    db.commit()
-    db.refresh(table)
+    renamed = code is not None or name is not None
+    await commit_or_conflict(db, TABLE_CONFLICTS)
+    if renamed:
+        # public order details embed the table's code and name
+        invalidate_public_orders()
+    await db.refresh(table)
     return serialize_table_with_qr(table)
 
 
+@app.get("/table/qr/export", tags=["Table"])
+async def export_table_qr(
+    format: str          = "zip",
+    db    : AsyncSession = Depends(get_async_db),
+    _=AdminOnly,
+):
+    """
+    Every active table's QR, labelled with its code and name, as a ZIP of
+    PNGs (`format=zip`) or a printable A4 PDF sheet (`format=pdf`). Cards
+    are rendered in parallel on the process pool and streamed as they finish.
+    """
+    if format not in ("zip", "pdf"):
+        raise HTTPException(
+            status_code=422,
+            detail="format must be zip or pdf"
+        )
+
+    result = await db.execute(
+        select(models.TableModel)
+        .where(models.TableModel.is_active.is_(True))
+        .order_by(models.TableModel.code)
+    )
+    tables = result.scalars().all()
+
+    paths = await asyncio.gather(*(ensure_table_qr_image(table.code) for table in tables))
+    cards = [(file_path, table.code, table.name) for table, (file_path, _) in zip(tables, paths)]
+
+    loop = asyncio.get_running_loop()
+
+    def run(fn, *args):
+        return loop.run_in_executor(get_process_pool(), fn, *args)
+
+    window = max(WORKER_PROCESSES, 1) * 2
+    if format == "pdf":
+        return StreamingResponse(
+            stream_qr_pdf(cards, run, window),
+            media_type="application/pdf",
+            headers={"Content-Disposition": 'attachment; filename="table_qr.pdf"'},
+        )
+    return StreamingResponse(
+        stream_qr_zip(cards, run, window),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="table_qr.zip"'},
+    )
+
+
 @app.get("/table/{table_id}/qr", tags=["Table"])
 async def get_table_qr(
     table_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    table = db.query(models.TableModel).filter(models.TableModel.id == table_id).first()
+    table = await db.get(models.TableModel, table_id)
     if not table:
         raise HTTPException(
             status_code=404,
             detail=f"{table_id} not found"
         )
-    _, qr_public_url = ensure_table_qr_image(table.code)
+    _, qr_public_url = await ensure_table_qr_image(table.code)
     return {
         "table_id": table.id,
         "table_code": table.code,
@@ -208,31 +271,31 @@ async def get_table_qr(
 @app.get("/table/{table_id}/qr/image", tags=["Table"])
 async def get_table_qr_image(
     table_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    table = db.query(models.TableModel).filter(models.TableModel.id == table_id).first()
+    table = await db.get(models.TableModel, table_id)
     if not table:
         raise HTTPException(status_code=404, detail=f"{table_id} not found")
 
-    file_path, _ = ensure_table_qr_image(table.code)
+    file_path, _ = await ensure_table_qr_image(table.code)
     return FileResponse(path=file_path, media_type="image/png", filename=_table_qr_filename(table.code))
 
 
 @app.delete("/table/{table_id}", tags=["Table"])
 async def delete_table(
     table_id: str,
-    db      : Session = Depends(get_db),
+    db      : AsyncSession = Depends(get_async_db),
     _=AdminOnly,
 ):
-    table = db.query(models.TableModel).filter(models.TableModel.id == table_id).first()
+    table = await db.get(models.TableModel, table_id)
     if not table:
         raise HTTPException(
             status_code=404, 
             detail=f"{table_id} not found"
         )
 
-    db.delete(table)
-    db.commit()
+    await db.delete(table)
+    await db.commit()
     return {
         "message": "Delete successfully", 
         "id": table_id
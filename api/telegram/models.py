@@ -1,9 +1,12 @@
-from sqlalchemy import Column, String, DateTime, func
+from sqlalchemy import Column, String, DateTime, Index, func
 from core.db import Base
 
 
 class TelegramUserModel(Base):
     __tablename__ = "telegram_users"
+    __table_args__ = (
+        Index("ix_telegram_users_created_at_telegram_id", "created_at", "telegram_id"),
+    )
 
     telegram_id     = Column(String, primary_key=True, index=True)
     username        = Column(String, nullable=True)
@@ -0,0 +1,301 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+import httpx
+
+# Telegram allows ~30 messages/s per bot and ~20 messages/min per group chat.
+TELEGRAM_OUTBOX_GLOBAL_RATE = float(os.getenv("TELEGRAM_OUTBOX_GLOBAL_RATE", "25"))
+TELEGRAM_OUTBOX_GLOBAL_BURST = int(os.getenv("TELEGRAM_OUTBOX_GLOBAL_BURST", "25"))
+TELEGRAM_OUTBOX_CHAT_RATE = float(os.getenv("TELEGRAM_OUTBOX_CHAT_RATE", str(20 / 60)))
+TELEGRAM_OUTBOX_CHAT_BURST = int(os.getenv("TELEGRAM_OUTBOX_CHAT_BURST", "3"))
+TELEGRAM_OUTBOX_MAX_QUEUE = int(os.getenv("TELEGRAM_OUTBOX_MAX_QUEUE", "1000"))
+TELEGRAM_OUTBOX_MAX_ATTEMPTS = int(os.getenv("TELEGRAM_OUTBOX_MAX_ATTEMPTS", "5"))
+TELEGRAM_OUTBOX_BACKOFF_BASE = float(os.getenv("TELEGRAM_OUTBOX_BACKOFF_BASE", "1"))
+TELEGRAM_OUTBOX_BACKOFF_MAX = float(os.getenv("TELEGRAM_OUTBOX_BACKOFF_MAX", "60"))
+TELEGRAM_OUTBOX_WORKERS = int(os.getenv("TELEGRAM_OUTBOX_WORKERS", "2"))
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """
+        Seconds until a token is available (0 if one is available now).
+        """
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self._refill()
+        self.tokens -= 1
+
+    def pause(self, seconds: float) -> None:
+        """
+        Drain the bucket so nothing is sent for `seconds` (used for 429s).
+        """
+        self._refill()
+        self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+
+@dataclass
+class OutboxJob:
+    method: str
+    payload: dict
+    chat_id: str | None = None
+    attempts: int = 0
+    # set when the chat's token was taken while the job was held back
+    has_chat_token: bool = False
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class TelegramOutbox:
+    """
+    In-process queue for outbound Bot API calls.
+
+    Handlers enqueue and return at once. Workers drain the queue under a
+    global token bucket plus one per chat. They honour `retry_after` on 429
+    and retry other failures with exponential backoff.
+
+    Only the global bucket makes a worker wait. A job for a chat whose bucket
+    is empty is held in that chat's own FIFO, and one release task per chat
+    feeds it back to the queue as tokens refill, so a busy group chat never
+    ties up the workers other chats need.
+    """
+
+    def __init__(self):
+        self.queue: asyncio.Queue[OutboxJob] | None = None
+        self.global_bucket = TokenBucket(TELEGRAM_OUTBOX_GLOBAL_RATE, TELEGRAM_OUTBOX_GLOBAL_BURST)
+        self.chat_buckets: dict[str, TokenBucket] = {}
+        self.workers: list[asyncio.Task] = []
+        self.retry_tasks: set[asyncio.Task] = set()
+        self.inline_tasks: set[asyncio.Task] = set()
+        self.held: dict[str, deque[OutboxJob]] = {}
+        self.release_tasks: dict[str, asyncio.Task] = {}
+        self.stats = {
+            "enqueued": 0,
+            "sent": 0,
+            "retried": 0,
+            "rate_limited": 0,
+            "failed": 0,
+            "dropped": 0,
+            "held": 0,
+        }
+
+    def _chat_bucket(self, chat_id: str) -> TokenBucket:
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(TELEGRAM_OUTBOX_CHAT_RATE, TELEGRAM_OUTBOX_CHAT_BURST)
+            self.chat_buckets[chat_id] = bucket
+        return bucket
+
+    def start(self, workers: int = TELEGRAM_OUTBOX_WORKERS) -> None:
+        if self.workers:
+            return
+        self.queue = asyncio.Queue(maxsize=TELEGRAM_OUTBOX_MAX_QUEUE)
+        self.workers = [asyncio.create_task(self._worker()) for _ in range(max(workers, 1))]
+
+    async def stop(self, drain_timeout: float = 5) -> None:
+        if not self.workers:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            print(f"Telegram outbox stopped with {self.queue.qsize()} pending message(s)")
+        held = sum(len(jobs) for jobs in self.held.values())
+        if held:
+            print(f"Telegram outbox stopped with {held} throttled message(s)")
+        tasks = [*self.workers, *self.retry_tasks, *self.release_tasks.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.workers = []
+        self.retry_tasks.clear()
+        self.release_tasks.clear()
+        self.held.clear()
+
+    def enqueue(self, method: str, payload: dict, chat_id: str | None = None) -> bool:
+        if self.queue is None:
+            # Not started (e.g. a script without the app lifespan): send inline.
+            task = asyncio.get_running_loop().create_task(self._send_now(OutboxJob(method, payload, chat_id)))
+            self.inline_tasks.add(task)
+            task.add_done_callback(self.inline_tasks.discard)
+            return True
+        try:
+            self.queue.put_nowait(OutboxJob(method, payload, chat_id))
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            print(f"Telegram outbox full; dropped {method}")
+            return False
+        self.stats["enqueued"] += 1
+        return True
+
+    async def _wait_for_global_token(self) -> None:
+        while True:
+            delay = self.global_bucket.delay()
+            if delay <= 0:
+                self.global_bucket.take()
+                return
+            await asyncio.sleep(delay)
+
+    def _take_chat_token(self, job: OutboxJob) -> bool:
+        """
+        True when `job` may be sent now as far as its chat is concerned;
+        otherwise it is held (behind anything already held for the chat).
+        """
+        if not job.chat_id or job.has_chat_token:
+            job.has_chat_token = False
+            return True
+        bucket = self._chat_bucket(job.chat_id)
+        if job.chat_id not in self.held and bucket.delay() <= 0:
+            bucket.take()
+            return True
+        self._hold(job)
+        return False
+
+    def _hold(self, job: OutboxJob) -> None:
+        if sum(len(jobs) for jobs in self.held.values()) >= TELEGRAM_OUTBOX_MAX_QUEUE:
+            self.stats["dropped"] += 1
+            print(f"Telegram outbox full; dropped {job.method}")
+            return
+        self.stats["held"] += 1
+        self.held.setdefault(job.chat_id, deque()).append(job)
+        if job.chat_id not in self.release_tasks:
+            self.release_tasks[job.chat_id] = asyncio.create_task(self._release(job.chat_id))
+
+    async def _release(self, chat_id: str) -> None:
+        """
+        Feed a chat's held jobs back to the queue, in order, one per token.
+        """
+        bucket = self._chat_bucket(chat_id)
+        jobs = self.held[chat_id]
+        try:
+            while jobs:
+                delay = bucket.delay()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                    continue
+                bucket.take()
+                job = jobs.popleft()
+                job.has_chat_token = True
+                await self.queue.put(job)
+        finally:
+            # in the same step as the last check, so a job held from here on
+            # starts a new release task
+            self.held.pop(chat_id, None)
+            self.release_tasks.pop(chat_id, None)
+
+    async def _send_now(self, job: OutboxJob) -> None:
+        from .services import tg_post
+
+        try:
+            await tg_post(job.method, job.payload)
+            self.stats["sent"] += 1
+        except Exception as exc:
+            self.stats["failed"] += 1
+            print(f"Telegram {job.method} failed: {exc}")
+
+    def _schedule_retry(self, job: OutboxJob, delay: float) -> None:
+        async def requeue():
+            await asyncio.sleep(delay)
+            try:
+                self.queue.put_nowait(job)
+            except asyncio.QueueFull:
+                self.stats["dropped"] += 1
+
+        task = asyncio.create_task(requeue())
+        self.retry_tasks.add(task)
+        task.add_done_callback(self.retry_tasks.discard)
+
+    async def _attempt(self, job: OutboxJob) -> None:
+        from .services import tg_post
+
+        if not self._take_chat_token(job):
+            return
+        await self._wait_for_global_token()
+        job.attempts += 1
+        try:
+            await tg_post(job.method, job.payload)
+            self.stats["sent"] += 1
+            return
+        except httpx.HTTPStatusError as exc:
+            response = exc.response
+            if response.status_code == 429:
+                self.stats["rate_limited"] += 1
+                delay = _retry_after(response)
+                if job.chat_id:
+                    self._chat_bucket(job.chat_id).pause(delay)
+                else:
+                    self.global_bucket.pause(delay)
+            elif response.status_code < 500:
+                self.stats["failed"] += 1
+                print(f"Telegram {job.method} rejected ({response.status_code}): {response.text}")
+                return
+            else:
+                delay = _backoff(job.attempts)
+        except httpx.HTTPError as exc:
+            print(f"Telegram {job.method} error: {exc}")
+            delay = _backoff(job.attempts)
+
+        if job.attempts >= TELEGRAM_OUTBOX_MAX_ATTEMPTS:
+            self.stats["failed"] += 1
+            print(f"Telegram {job.method} gave up after {job.attempts} attempt(s)")
+            return
+
+        self.stats["retried"] += 1
+        self._schedule_retry(job, delay)
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self.queue.get()
+            try:
+                await self._attempt(job)
+            except Exception as exc:
+                self.stats["failed"] += 1
+                print(f"Telegram outbox worker error: {exc}")
+            finally:
+                self.queue.task_done()
+
+    def snapshot(self) -> dict:
+        return {
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "queue_capacity": TELEGRAM_OUTBOX_MAX_QUEUE,
+            "scheduled_retries": len(self.retry_tasks),
+            "throttled_chats": len(self.held),
+            "throttled_messages": sum(len(jobs) for jobs in self.held.values()),
+            "workers": len(self.workers),
+            **self.stats,
+        }
+
+
+def _retry_after(response: httpx.Response) -> float:
+    try:
+        return float(response.json()["parameters"]["retry_after"])
+    except Exception:
+        pass
+    try:
+        return float(response.headers.get("Retry-After", ""))
+    except ValueError:
+        return TELEGRAM_OUTBOX_BACKOFF_BASE
+
+
+def _backoff(attempts: int) -> float:
+    delay = min(TELEGRAM_OUTBOX_BACKOFF_MAX, TELEGRAM_OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1)
+
+
+outbox = TelegramOutbox()
@@ -1,11 +1,64 @@
 import os
+import time
 import httpx
 from typing import Any
 
+from core.metrics import TELEGRAM_ERRORS, TELEGRAM_LATENCY
+from core.tracing import telegram_span
+
 BOT_TOKEN = os.getenv("BOT_TOKEN", "")
 KITCHEN_CHAT_ID = os.getenv("KITCHEN_CHAT_ID", "")
 TG_API = f"https://api.telegram.org/bot{BOT_TOKEN}"
 
+TELEGRAM_HTTP_TIMEOUT = float(os.getenv("TELEGRAM_HTTP_TIMEOUT", "20"))
+TELEGRAM_HTTP_CONNECT_TIMEOUT = float(os.getenv("TELEGRAM_HTTP_CONNECT_TIMEOUT", "5"))
+TELEGRAM_HTTP_MAX_CONNECTIONS = int(os.getenv("TELEGRAM_HTTP_MAX_CONNECTIONS", "20"))
+TELEGRAM_HTTP_MAX_KEEPALIVE = int(os.getenv("TELEGRAM_HTTP_MAX_KEEPALIVE", "10"))
+TELEGRAM_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("TELEGRAM_HTTP_KEEPALIVE_EXPIRY", "60"))
+TELEGRAM_HTTP2 = os.getenv("TELEGRAM_HTTP2", "false").strip().lower() in {"1", "true", "yes", "on"}
+
+# One pooled client for every Bot API call, so messages reuse warm
+# keep-alive connections instead of a new TCP + TLS handshake each time.
+_http_client: httpx.AsyncClient | None = None
+
+
+def _http2_enabled() -> bool:
+    if not TELEGRAM_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ModuleNotFoundError:
+        print("TELEGRAM_HTTP2 needs `pip install httpx[http2]`; using HTTP/1.1")
+        return False
+    return True
+
+
+def _build_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=TG_API,
+        http2=_http2_enabled(),
+        timeout=httpx.Timeout(TELEGRAM_HTTP_TIMEOUT, connect=TELEGRAM_HTTP_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=TELEGRAM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=TELEGRAM_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=TELEGRAM_HTTP_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = _build_http_client()
+    return _http_client
+
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
 
 def build_order_keyboard(order_id: str) -> dict:
     return {
@@ -22,10 +75,20 @@ async def tg_post(method: str, payload: dict) -> dict:
     if not BOT_TOKEN:
         raise RuntimeError("BOT_TOKEN missing in .env")
 
-    async with httpx.AsyncClient(timeout=20) as client:
-        r = await client.post(f"{TG_API}/{method}", json=payload)
-        r.raise_for_status()
-        return r.json()
+    start = time.perf_counter()
+    try:
+        with telegram_span(method):
+            r = await get_http_client().post(f"/{method}", json=payload)
+            r.raise_for_status()
+            return r.json()
+    except httpx.HTTPStatusError as exc:
+        TELEGRAM_ERRORS.labels(method, str(exc.response.status_code)).inc()
+        raise
+    except Exception as exc:
+        TELEGRAM_ERRORS.labels(method, type(exc).__name__).inc()
+        raise
+    finally:
+        TELEGRAM_LATENCY.labels(method).observe(time.perf_counter() - start)
 
 
 async def send_message(chat_id: str, text: str, reply_markup: dict | None = None) -> dict:
@@ -35,6 +98,18 @@ async def send_message(chat_id: str, text: str, reply_markup: dict | None = None
     return await tg_post("sendMessage", payload)
 
 
+def enqueue_message(chat_id: str, text: str, reply_markup: dict | None = None) -> bool:
+    """
+    Queue a sendMessage on the rate-limited outbox instead of awaiting it.
+    """
+    from .outbox import outbox
+
+    payload = {"chat_id": chat_id, "text": text, "parse_mode": "HTML"}
+    if reply_markup:
+        payload["reply_markup"] = reply_markup
+    return outbox.enqueue("sendMessage", payload, chat_id=str(chat_id))
+
+
 async def answer_callback(callback_query_id: str, text: str = "OK") -> dict:
     return await tg_post("answerCallbackQuery", {
         "callback_query_id": callback_query_id,
@@ -83,22 +158,7 @@ async def notify_kitchen_new_order(order: Any, items: list[Any], table_code: str
 
     text = format_order_message(order, items, table_code)
     kb = build_order_keyboard(str(order.id))
-    await send_message(KITCHEN_CHAT_ID, text, reply_markup=kb)
-
-BOT_TOKEN = os.getenv("BOT_TOKEN", "")
-KITCHEN_CHAT_ID = os.getenv("KITCHEN_CHAT_ID", "")
-TG_API = f"https://api.telegram.org/bot{BOT_TOKEN}"
-
-async def send_message(chat_id: str, text: str) -> dict:
-    if not BOT_TOKEN:
-        raise RuntimeError("BOT_TOKEN missing in .env")
-    async with httpx.AsyncClient(timeout=20) as client:
-        r = await client.post(
-            f"{TG_API}/sendMessage",
-            json={"chat_id": chat_id, "text": text, "parse_mode": "HTML"},
-        )
-        r.raise_for_status()
-        return r.json()
+    enqueue_message(KITCHEN_CHAT_ID, text, reply_markup=kb)
 
 
 async def notify_kitchen_user_ping(table_code: str | None, username: str | None, telegram_id: str, text: str | None = None):
@@ -113,4 +173,4 @@ async def notify_kitchen_user_ping(table_code: str | None, username: str | None,
     if text:
         msg += f"Text: <i>{text}</i>"
 
-    await send_message(KITCHEN_CHAT_ID, msg)
\ No newline at end of file
+    enqueue_message(KITCHEN_CHAT_ID, msg)
\ No newline at end of file
@@ -0,0 +1,96 @@
+import asyncio
+import os
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+TELEGRAM_UPDATE_WORKERS = int(os.getenv("TELEGRAM_UPDATE_WORKERS", "4"))
+TELEGRAM_UPDATE_QUEUE_SIZE = int(os.getenv("TELEGRAM_UPDATE_QUEUE_SIZE", "500"))
+TELEGRAM_UPDATE_DEDUP_SIZE = int(os.getenv("TELEGRAM_UPDATE_DEDUP_SIZE", "5000"))
+
+
+class UpdateDispatcher:
+    """
+    Bounded queue of incoming webhook updates drained by async workers, so
+    the webhook can answer Telegram right away. Updates whose `update_id`
+    was seen recently (Telegram re-deliveries) are dropped on submit.
+    """
+
+    def __init__(self, handler: Callable[[dict[str, Any]], Awaitable[None]]):
+        self.handler = handler
+        self.queue: asyncio.Queue[dict[str, Any]] | None = None
+        self.workers: list[asyncio.Task] = []
+        self.seen: OrderedDict[int, None] = OrderedDict()
+        self.stats = {"accepted": 0, "duplicates": 0, "rejected": 0, "processed": 0, "failed": 0}
+
+    def start(self, workers: int = TELEGRAM_UPDATE_WORKERS) -> None:
+        if self.workers:
+            return
+        self.queue = asyncio.Queue(maxsize=TELEGRAM_UPDATE_QUEUE_SIZE)
+        self.workers = [asyncio.create_task(self._worker()) for _ in range(max(workers, 1))]
+
+    async def stop(self, drain_timeout: float = 5) -> None:
+        if not self.workers:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            print(f"Telegram update queue stopped with {self.queue.qsize()} pending update(s)")
+        for task in self.workers:
+            task.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    def _is_duplicate(self, update_id: Any) -> bool:
+        if not isinstance(update_id, int):
+            return False
+        if update_id in self.seen:
+            self.seen.move_to_end(update_id)
+            return True
+        self.seen[update_id] = None
+        if len(self.seen) > TELEGRAM_UPDATE_DEDUP_SIZE:
+            self.seen.popitem(last=False)
+        return False
+
+    def submit(self, update: dict[str, Any]) -> bool:
+        """
+        Queue an update. Returns False only when the queue is full, in which
+        case the caller should let Telegram retry later.
+        """
+        if not self.workers:
+            self.start()
+
+        update_id = update.get("update_id")
+        if self._is_duplicate(update_id):
+            self.stats["duplicates"] += 1
+            return True
+
+        try:
+            self.queue.put_nowait(update)
+        except asyncio.QueueFull:
+            # Forget it so Telegram's re-delivery is not treated as a duplicate.
+            self.seen.pop(update_id, None)
+            self.stats["rejected"] += 1
+            return False
+
+        self.stats["accepted"] += 1
+        return True
+
+    async def _worker(self) -> None:
+        while True:
+            update = await self.queue.get()
+            try:
+                await self.handler(update)
+                self.stats["processed"] += 1
+            except Exception as exc:
+                self.stats["failed"] += 1
+                print(f"Telegram update {update.get('update_id')} failed: {exc}")
+            finally:
+                self.queue.task_done()
+
+    def snapshot(self) -> dict:
+        return {
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "queue_capacity": TELEGRAM_UPDATE_QUEUE_SIZE,
+            "workers": len(self.workers),
+            **self.stats,
+        }
@@ -1,23 +1,36 @@
 import os
+from datetime import datetime
 from typing import Any
 
-import httpx
-from fastapi import Depends, Header, HTTPException
+from fastapi import Depends, Header, HTTPException, Response
+from sqlalchemy import tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from api.common.pagination import decode_time_cursor, set_next_cursor
 from api.orders.enums import OrderStatus
+from api.orders.events import ORDER_STATUS_CHANGED, publish_order_event
 from api.orders.models import OrderModel
+from api.public.order_cache import invalidate_public_order
 from api.telegram.schemas import TelegramUserOut
-from core.db import get_db
+from core.db import AsyncSessionLocal, get_db
 from deps.permissions import AdminOnly
 from main import app
 
 from .models import TelegramUserModel
-from .services import notify_kitchen_user_ping
+from .outbox import outbox
+from .updates import UpdateDispatcher
+from .services import (
+    answer_callback,
+    close_http_client,
+    edit_message,
+    enqueue_message,
+    get_http_client,
+    notify_kitchen_user_ping,
+    tg_post,
+)
 
-BOT_TOKEN = os.getenv("BOT_TOKEN", "")
 KITCHEN_CHAT_ID = os.getenv("KITCHEN_CHAT_ID", "")
-TG_API = f"https://api.telegram.org/bot{BOT_TOKEN}"
 
 TELEGRAM_WEBHOOK_URL = os.getenv("TELEGRAM_WEBHOOK_URL", "").strip()
 TELEGRAM_WEBHOOK_SECRET = os.getenv("TELEGRAM_WEBHOOK_SECRET", "").strip()
@@ -37,37 +50,6 @@ def _resolved_webhook_url() -> str:
     return ""
 
 
-async def tg_post(method: str, payload: dict) -> dict:
-    if not BOT_TOKEN:
-        raise RuntimeError("BOT_TOKEN missing in env")
-
-    async with httpx.AsyncClient(timeout=20) as client:
-        response = await client.post(f"{TG_API}/{method}", json=payload)
-        response.raise_for_status()
-        return response.json()
-
-
-async def send_message(chat_id: str, text: str, reply_markup: dict | None = None) -> dict:
-    payload = {"chat_id": chat_id, "text": text, "parse_mode": "HTML"}
-    if reply_markup:
-        payload["reply_markup"] = reply_markup
-    return await tg_post("sendMessage", payload)
-
-
-async def answer_callback(callback_query_id: str, text: str = "OK") -> dict:
-    return await tg_post(
-        "answerCallbackQuery",
-        {"callback_query_id": callback_query_id, "text": text, "show_alert": False},
-    )
-
-
-async def edit_message(chat_id: str, message_id: int, text: str, reply_markup: dict | None = None) -> dict:
-    payload = {"chat_id": chat_id, "message_id": message_id, "text": text, "parse_mode": "HTML"}
-    if reply_markup is not None:
-        payload["reply_markup"] = reply_markup
-    return await tg_post("editMessageText", payload)
-
-
 def build_order_keyboard(order_id: str) -> dict:
     return {
         "inline_keyboard": [
@@ -112,7 +94,7 @@ async def notify_kitchen_new_order(order: Any, items: list[Any], table_code: str
 
     text = format_order_message(order, items, table_code)
     keyboard = build_order_keyboard(str(order.id))
-    await send_message(KITCHEN_CHAT_ID, text, reply_markup=keyboard)
+    enqueue_message(KITCHEN_CHAT_ID, text, reply_markup=keyboard)
 
 
 async def set_telegram_webhook() -> dict:
@@ -126,7 +108,7 @@ async def set_telegram_webhook() -> dict:
     return await tg_post("setWebhook", payload)
 
 
-async def _handle_start_command(message: dict, db: Session) -> None:
+async def _handle_start_command(message: dict, db: AsyncSession) -> None:
     text = (message.get("text") or "").strip()
     if not text.startswith("/start"):
         return
@@ -141,7 +123,7 @@ async def _handle_start_command(message: dict, db: Session) -> None:
     if len(parts) == 2:
         table_code = parts[1].strip() or None
 
-    user = db.query(TelegramUserModel).filter(TelegramUserModel.telegram_id == telegram_id).first()
+    user = await db.get(TelegramUserModel, telegram_id)
     if not user:
         user = TelegramUserModel(telegram_id=telegram_id)
         db.add(user)
@@ -151,16 +133,16 @@ async def _handle_start_command(message: dict, db: Session) -> None:
     user.last_name = from_user.get("last_name")
     if table_code:
         user.last_table_code = table_code
-    db.commit()
+    await db.commit()
 
     chat_id = str((message.get("chat") or {}).get("id") or telegram_id)
     if table_code:
-        await send_message(chat_id, f"Table linked: <b>{table_code}</b>")
+        enqueue_message(chat_id, f"Table linked: <b>{table_code}</b>")
     else:
-        await send_message(chat_id, "Welcome. Use /start <table_code> to link your table.")
+        enqueue_message(chat_id, "Welcome. Use /start <table_code> to link your table.")
 
 
-async def _handle_order_callback(callback: dict, db: Session) -> None:
+async def _handle_order_callback(callback: dict, db: AsyncSession) -> None:
     data = callback.get("data") or ""
     callback_id = callback.get("id")
     message = callback.get("message") or {}
@@ -179,12 +161,13 @@ async def _handle_order_callback(callback: dict, db: Session) -> None:
         return
 
     _, action, order_id = parts
-    order = db.query(OrderModel).filter(OrderModel.id == order_id).first()
+    order = await db.get(OrderModel, order_id)
     if not order:
         if callback_id:
             await answer_callback(str(callback_id), "Order not found")
         return
 
+    previous_status = order.status
     if action == "accept":
         order.status = OrderStatus.ACCEPTED
         status_text = "ACCEPTED"
@@ -196,7 +179,11 @@ async def _handle_order_callback(callback: dict, db: Session) -> None:
             await answer_callback(str(callback_id), "Unknown action")
         return
 
-    db.commit()
+    order.updated_at = datetime.utcnow()
+    await db.commit()
+    invalidate_public_order(order_id)
+    if order.status != previous_status:
+        publish_order_event(ORDER_STATUS_CHANGED, order, previous_status)
 
     if callback_id:
         await answer_callback(str(callback_id), f"Order {status_text}")
@@ -207,6 +194,35 @@ async def _handle_order_callback(callback: dict, db: Session) -> None:
             await edit_message(chat_id, message_id, f"{current_text}\n\nStatus: <b>{status_text}</b>")
 
 
+async def process_update(update: dict[str, Any]) -> None:
+    async with AsyncSessionLocal() as db:
+        callback = update.get("callback_query")
+        if isinstance(callback, dict):
+            await _handle_order_callback(callback, db)
+
+        message = update.get("message")
+        if isinstance(message, dict):
+            await _handle_start_command(message, db)
+            await _handle_any_message_ping(message, db)   # ✅ notify kitchen on ANY message
+
+
+update_dispatcher = UpdateDispatcher(process_update)
+
+
+@app.on_event("startup")
+async def init_telegram_http_client() -> None:
+    get_http_client()
+    outbox.start()
+    update_dispatcher.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_telegram_http_client() -> None:
+    await update_dispatcher.stop()
+    await outbox.stop()
+    await close_http_client()
+
+
 @app.on_event("startup")
 async def init_telegram_webhook() -> None:
     if not TELEGRAM_AUTO_SET_WEBHOOK:
@@ -222,20 +238,17 @@ async def init_telegram_webhook() -> None:
 @app.post("/telegram/webhook", tags=["Telegram"])
 async def telegram_webhook(
     update: dict[str, Any],
-    db: Session = Depends(get_db),
     x_telegram_bot_api_secret_token: str | None = Header(default=None, alias="X-Telegram-Bot-Api-Secret-Token"),
 ):
+    """
+    Validate and queue the update, then answer at once; the work happens on
+    the update workers (see process_update).
+    """
     if TELEGRAM_WEBHOOK_SECRET and x_telegram_bot_api_secret_token != TELEGRAM_WEBHOOK_SECRET:
         raise HTTPException(status_code=403, detail="Invalid Telegram secret token")
 
-    callback = update.get("callback_query")
-    if isinstance(callback, dict):
-        await _handle_order_callback(callback, db)
-
-    message = update.get("message")
-    if isinstance(message, dict):
-        await _handle_start_command(message, db)
-        await _handle_any_message_ping(message, db)   # ✅ notify kitchen on ANY message
+    if not update_dispatcher.submit(update):
+        raise HTTPException(status_code=503, detail="Update queue is full")
 
     return {"ok": True}
 
@@ -255,6 +268,16 @@ async def telegram_webhook_delete() -> dict:
     return await tg_post("deleteWebhook", {"drop_pending_updates": False})
 
 
+@app.get("/telegram/outbox/stats", tags=["Telegram"], dependencies=[AdminOnly])
+async def telegram_outbox_stats() -> dict:
+    return outbox.snapshot()
+
+
+@app.get("/telegram/updates/stats", tags=["Telegram"], dependencies=[AdminOnly])
+async def telegram_updates_stats() -> dict:
+    return update_dispatcher.snapshot()
+
+
 @app.get(
     "/telegram/users",
     response_model=list[TelegramUserOut],
@@ -262,20 +285,32 @@ async def telegram_webhook_delete() -> dict:
     dependencies=[AdminOnly],
 )
 def get_all_telegram_users(
+    response: Response,
     skip: int = 0,
     limit: int = 50,
+    after: str | None = None,
     db: Session = Depends(get_db),
 ):
+    q = db.query(TelegramUserModel)
+
+    if after is not None:
+        after_created_at, after_id = decode_time_cursor(after)
+        q = q.filter(
+            tuple_(TelegramUserModel.created_at, TelegramUserModel.telegram_id)
+            < tuple_(after_created_at, after_id)
+        )
+    elif skip:
+        q = q.offset(skip)
+
     users = (
-        db.query(TelegramUserModel)
-        .order_by(TelegramUserModel.created_at.desc())
-        .offset(skip)
+        q.order_by(TelegramUserModel.created_at.desc(), TelegramUserModel.telegram_id.desc())
         .limit(limit)
         .all()
     )
+    set_next_cursor(response, users, limit, "created_at", "telegram_id")
     return users
 
-async def _handle_any_message_ping(message: dict, db: Session) -> None:
+async def _handle_any_message_ping(message: dict, db: AsyncSession) -> None:
     """
     When user types anything (after scanning QR /start), notify kitchen group
     with table_code + username/telegram_id.
@@ -292,7 +327,7 @@ async def _handle_any_message_ping(message: dict, db: Session) -> None:
     username = from_user.get("username")
 
     # get latest table code stored in DB
-    user = db.query(TelegramUserModel).filter(TelegramUserModel.telegram_id == telegram_id).first()
+    user = await db.get(TelegramUserModel, telegram_id)
     table_code = user.last_table_code if user else None
 
     # If message is "/start TB001", we can parse TB001 too (more reliable on first time)
@@ -2,9 +2,15 @@ from fastapi import Form, HTTPException, Depends
 from deps.permissions import AdminOnly
 from main import app
 from core.db import get_db
+from api.common.integrity import commit_or_conflict_sync
 from api.telegram_users import models
 from sqlalchemy.orm import Session
 
+TELEGRAM_USER_CONFLICTS = {
+    "id"              : "Telegram user id already exists",
+    "telegram_user_id": "telegram_user_id already exists",
+}
+
 
 @app.post("/telegram_user", tags=["Telegram User"])
 def create_telegram_user(
@@ -14,16 +20,6 @@ def create_telegram_user(
     db               : Session = Depends(get_db),
     _=AdminOnly,
 ):
-
-    exists = db.query(models.Telegram_user).filter(
-        models.Telegram_user.telegram_user_id == telegram_user_id
-    ).first()
-    if exists:
-        raise HTTPException(
-            status_code=409, 
-            detail="telegram_user_id already exists"
-        )
-
     new_telegram_user = models.Telegram_user(
         id                = row_id,
         telegram_user_id  = telegram_user_id,
@@ -31,7 +27,7 @@ def create_telegram_user(
     )
 
     db.add(new_telegram_user)
-    db.commit()
+    commit_or_conflict_sync(db, TELEGRAM_USER_CONFLICTS)
     db.refresh(new_telegram_user)
     return new_telegram_user
 
@@ -84,23 +80,13 @@ async def update_tg_user(
             detail=f"ID {tg_user_id} not found"
         )
 
-   
-    if telegram_user_id is not None and telegram_user_id != user.telegram_user_id:
-        exists = db.query(models.Telegram_user).filter(
-            models.Telegram_user.telegram_user_id == telegram_user_id
-        ).first()
-        if exists:
-            raise HTTPException(
-                status_code=409, 
-                detail="telegram_user_id already exists"
-            )
+    if telegram_user_id is not None:
         user.telegram_user_id = telegram_user_id
 
-
     if telegram_username is not None:
         user.telegram_username = telegram_username
 
-    db.commit()
+    commit_or_conflict_sync(db, TELEGRAM_USER_CONFLICTS)
     db.refresh(user)
     return user
 
@@ -13,6 +13,18 @@ class Config :
     POSTGRES_PORT     = os.getenv("DB_PORT")
     POSTGRES_DB       = os.getenv("DB_NAME")
     DATABASE_URL      = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_SERVER}:{POSTGRES_PORT}/{POSTGRES_DB}"
+    ASYNC_DATABASE_URL = f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_SERVER}:{POSTGRES_PORT}/{POSTGRES_DB}"
+
+    # Connection pool, applied to both the sync and the async engine. Each
+    # worker can open up to 2 * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections,
+    # so keep workers * that below Postgres `max_connections`.
+    DB_POOL_SIZE      = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW   = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT   = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE   = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING  = os.getenv("DB_POOL_PRE_PING", "true").strip().lower() in {"1", "true", "yes", "on"}
+    DB_POOL_WARMUP    = int(os.getenv("DB_POOL_WARMUP", os.getenv("DB_POOL_SIZE", "5")))
+    DB_ECHO           = os.getenv("DB_ECHO", "false").strip().lower() in {"1", "true", "yes", "on"}
 
 
 config = Config()
@@ -1,13 +1,85 @@
+import asyncio
+import threading
+import time
+
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from config import config
+from core.metrics import POOL_WAIT
 
 Base = declarative_base()
 
+
+class PoolWaitStats:
+    """
+    Time spent waiting for a pooled connection (including opening a new one).
+    """
+
+    def __init__(self, name: str):
+        self._histogram = POOL_WAIT.labels(name)
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, seconds: float) -> None:
+        self._histogram.observe(seconds)
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += seconds
+            if seconds > self.max_wait:
+                self.max_wait = seconds
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            avg = self.total_wait / self.checkouts if self.checkouts else 0.0
+            return {
+                "checkouts": self.checkouts,
+                "wait_total_ms": round(self.total_wait * 1000, 3),
+                "wait_avg_ms": round(avg * 1000, 3),
+                "wait_max_ms": round(self.max_wait * 1000, 3),
+            }
+
+
+class TimedQueuePool(QueuePool):
+    wait_stats = PoolWaitStats("sync")
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.wait_stats.record(time.perf_counter() - start)
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    wait_stats = PoolWaitStats("async")
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.wait_stats.record(time.perf_counter() - start)
+
+
+def _pool_options() -> dict:
+    return {
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+        "echo": config.DB_ECHO,
+    }
+
+
 engine = create_engine(
     config.DATABASE_URL,
-    pool_timeout=30,
-    echo=True
+    poolclass=TimedQueuePool,
+    **_pool_options(),
 )
 
 Session = sessionmaker(bind=engine)
@@ -16,4 +88,62 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# Async engine for the `async def` handlers: queries await on asyncpg instead
+# of blocking the event loop.
+async_engine = create_async_engine(
+    config.ASYNC_DATABASE_URL,
+    poolclass=TimedAsyncQueuePool,
+    **_pool_options(),
+)
+
+# expire_on_commit=False so handlers can return ORM objects after commit
+# without triggering a lazy (and, in async, illegal) reload.
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def _warm_up_sync_pool(count: int) -> None:
+    connections = [engine.connect() for _ in range(count)]
+    for connection in connections:
+        connection.close()
+
+
+async def warm_up_pools(count: int | None = None) -> None:
+    """
+    Open `count` connections on both engines and hand them back to the pool,
+    so the first requests after startup don't pay connect latency.
+    """
+    count = config.DB_POOL_WARMUP if count is None else count
+    count = min(count, config.DB_POOL_SIZE)
+    if count <= 0:
+        return
+
+    connections = await asyncio.gather(*(async_engine.connect() for _ in range(count)))
+    for connection in connections:
+        await connection.close()
+
+    await asyncio.to_thread(_warm_up_sync_pool, count)
+
+
+def pool_status() -> dict:
+    def describe(pool) -> dict:
+        return {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            **pool.wait_stats.snapshot(),
+        }
+
+    return {
+        "max_connections_per_worker": 2 * (config.DB_POOL_SIZE + config.DB_MAX_OVERFLOW),
+        "sync": describe(engine.pool),
+        "async": describe(async_engine.pool),
+    }
@@ -0,0 +1,145 @@
+import asyncio
+import json
+import os
+import uuid
+from collections import defaultdict
+from typing import Callable, Optional
+
+from sqlalchemy.engine import make_url
+
+CACHE_INVALIDATION_CHANNEL = os.getenv("CACHE_INVALIDATION_CHANNEL", "cache_invalidation")
+CACHE_INVALIDATION_RETRY = float(os.getenv("CACHE_INVALIDATION_RETRY", "2"))
+
+# handler(key): key None means "everything under this topic"
+Handler = Callable[[Optional[str]], None]
+
+
+class InvalidationBus:
+    """
+    Cross-worker cache invalidation over Postgres LISTEN/NOTIFY.
+
+    Each worker keeps one dedicated asyncpg connection that LISTENs on the
+    channel and sends this worker's NOTIFYs. `publish()` is fire-and-forget
+    (and safe from any thread): local caches are evicted by the caller, and
+    every *other* worker runs the handlers registered for the topic. After a
+    reconnect every handler runs with key None, since messages may have been
+    missed meanwhile.
+
+    Does nothing until started, and is never started on SQLite.
+    """
+
+    def __init__(self, channel: str = CACHE_INVALIDATION_CHANNEL):
+        self.channel = channel
+        self.origin = uuid.uuid4().hex
+        self._handlers: dict[str, list[Handler]] = defaultdict(list)
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._outgoing: asyncio.Queue[str] | None = None
+        self._task: asyncio.Task | None = None
+        self.sent = 0
+        self.received = 0
+        self.reconnects = 0
+
+    def register(self, topic: str, handler: Handler) -> None:
+        self._handlers[topic].append(handler)
+
+    def _dispatch(self, topic: str, key: Optional[str]) -> None:
+        for handler in self._handlers.get(topic, ()):
+            try:
+                handler(key)
+            except Exception as exc:
+                print(f"Invalidation handler for {topic} failed: {exc}")
+
+    def _dispatch_all(self) -> None:
+        for topic in list(self._handlers):
+            self._dispatch(topic, None)
+
+    def publish(self, topic: str, key: Optional[str] = None) -> None:
+        loop, outgoing = self._loop, self._outgoing
+        if loop is None or outgoing is None:
+            return
+        payload = json.dumps({"o": self.origin, "t": topic, "k": key}, separators=(",", ":"))
+        # sync routes and ORM events run in the threadpool
+        loop.call_soon_threadsafe(outgoing.put_nowait, payload)
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            return
+        if message.get("o") == self.origin:
+            return
+        self.received += 1
+        self._dispatch(message.get("t"), message.get("k"))
+
+    async def start(self, database_url: str) -> None:
+        if self._task is not None:
+            return
+        url = make_url(database_url).set(drivername="postgresql")
+        self._loop = asyncio.get_running_loop()
+        self._outgoing = asyncio.Queue()
+        self._task = asyncio.create_task(self._run(url.render_as_string(hide_password=False)))
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        self._loop = self._outgoing = None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self, dsn: str) -> None:
+        import asyncpg
+
+        first = True
+        pending: str | None = None
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(dsn)
+                lost = asyncio.Event()
+                connection.add_termination_listener(lambda _: lost.set())
+                await connection.add_listener(self.channel, self._on_notify)
+                if not first:
+                    self.reconnects += 1
+                    self._dispatch_all()
+                first = False
+
+                while not lost.is_set():
+                    if pending is None:
+                        get = asyncio.ensure_future(self._outgoing.get())
+                        wait_lost = asyncio.ensure_future(lost.wait())
+                        done, _ = await asyncio.wait({get, wait_lost}, return_when=asyncio.FIRST_COMPLETED)
+                        wait_lost.cancel()
+                        if get not in done:
+                            get.cancel()
+                            break
+                        pending = get.result()
+                    await connection.execute("SELECT pg_notify($1, $2)", self.channel, pending)
+                    pending = None
+                    self.sent += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                print(f"Cache invalidation bus disconnected: {exc}")
+            finally:
+                if connection is not None and not connection.is_closed():
+                    try:
+                        await connection.close(timeout=2)
+                    except Exception:
+                        connection.terminate()
+            await asyncio.sleep(CACHE_INVALIDATION_RETRY)
+
+    def snapshot(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "channel": self.channel,
+            "sent": self.sent,
+            "received": self.received,
+            "reconnects": self.reconnects,
+            "queued": self._outgoing.qsize() if self._outgoing is not None else 0,
+        }
+
+
+invalidation_bus = InvalidationBus()
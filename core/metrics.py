@@ -0,0 +1,176 @@
+import contextvars
+import os
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+from sqlalchemy import event
+
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "").strip()
+# Required with more than one uvicorn/gunicorn worker: each worker writes its
+# samples here and /metrics aggregates all of them. Must be set in the
+# environment before the workers start, and emptied on every server start.
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR", "").strip()
+
+if not PROMETHEUS_MULTIPROC_DIR and int(os.getenv("WEB_CONCURRENCY", "1") or 1) > 1:
+    print("PROMETHEUS_MULTIPROC_DIR is not set: /metrics only reports the worker that serves the scrape")
+
+REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP requests by route template and status code.",
+    ["method", "route", "status"],
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template.",
+    ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests currently being served.",
+    multiprocess_mode="livesum",
+)
+REQUEST_SQL = Histogram(
+    "http_request_sql_statements",
+    "SQL statements executed while serving one request.",
+    ["method", "route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100),
+)
+SQL_STATEMENTS = Counter(
+    "db_statements_total",
+    "SQL statements executed, per engine.",
+    ["engine"],
+)
+POOL_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled connection (including connecting).",
+    ["engine"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+TELEGRAM_LATENCY = Histogram(
+    "telegram_api_request_duration_seconds",
+    "Outbound Telegram Bot API call latency.",
+    ["method"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+TELEGRAM_ERRORS = Counter(
+    "telegram_api_errors_total",
+    "Failed Telegram Bot API calls, by HTTP status (or exception type).",
+    ["method", "reason"],
+)
+
+# per-request SQL statement count; a one-item list so event hooks running in
+# a copied context (threadpool, greenlet) still update the request's counter
+_sql_count: contextvars.ContextVar[list | None] = contextvars.ContextVar("sql_count", default=None)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def route_label(scope: dict) -> str:
+    """
+    The route template (`/order/{order_id}`), never the raw path, so label
+    cardinality stays bounded.
+    """
+    route = scope.get("route")
+    if route is not None:
+        return getattr(route, "path", UNMATCHED_ROUTE)
+    if "endpoint" in scope:  # a Mount, e.g. /static
+        return scope.get("root_path") or UNMATCHED_ROUTE
+    return UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (no BaseHTTPMiddleware, no body buffering). Child
+    metrics are cached per (method, route) so the per-request cost is a few
+    dict lookups plus the observations themselves.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._children: dict[tuple[str, str], tuple] = {}
+        self._counters: dict[tuple[str, str, int], object] = {}
+
+    def _metrics_for(self, method: str, route: str) -> tuple:
+        children = self._children.get((method, route))
+        if children is None:
+            children = (
+                REQUEST_LATENCY.labels(method, route),
+                REQUEST_SQL.labels(method, route),
+            )
+            self._children[(method, route)] = children
+        return children
+
+    def _counter_for(self, method: str, route: str, status_code: int):
+        key = (method, route, status_code)
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = self._counters[key] = REQUESTS.labels(method, route, str(status_code))
+        return counter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        counter = [0]
+        token = _sql_count.set(counter)
+        IN_PROGRESS.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            IN_PROGRESS.dec()
+            _sql_count.reset(token)
+
+            method = scope["method"]
+            route = route_label(scope)
+            latency, sql = self._metrics_for(method, route)
+            latency.observe(elapsed)
+            sql.observe(counter[0])
+            self._counter_for(method, route, status_code).inc()
+
+
+def instrument_engine(engine, name: str) -> None:
+    """
+    Count statements on `engine` (pass `async_engine.sync_engine` for the
+    async one), globally and for the request being served.
+    """
+    statements = SQL_STATEMENTS.labels(name)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.inc()
+        counter = _sql_count.get()
+        if counter is not None:
+            counter[0] += 1
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """
+    This worker's metrics, or every worker's (summed) in multiprocess mode.
+    """
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry, path=PROMETHEUS_MULTIPROC_DIR)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def mark_worker_dead() -> None:
+    """
+    On worker shutdown: drop this worker's live gauges (in-progress requests)
+    from the aggregate.
+    """
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid(), PROMETHEUS_MULTIPROC_DIR)
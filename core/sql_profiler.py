@@ -0,0 +1,148 @@
+import contextvars
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from sqlalchemy import event
+
+from core.metrics import route_label
+
+SQL_PROFILE = os.getenv("SQL_PROFILE", "false").strip().lower() in {"1", "true", "yes", "on"}
+SQL_SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "100"))
+SQL_REPEAT_THRESHOLD = int(os.getenv("SQL_REPEAT_THRESHOLD", "5"))
+# also log requests that were not flagged
+SQL_PROFILE_LOG_ALL = os.getenv("SQL_PROFILE_LOG_ALL", "false").strip().lower() in {"1", "true", "yes", "on"}
+
+
+@dataclass
+class QueryProfile:
+    count: int = 0
+    total_seconds: float = 0.0
+    statements: Counter = field(default_factory=Counter)
+    slow: list[tuple[float, str]] = field(default_factory=list)
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.total_seconds += seconds
+        self.statements[statement] += 1
+        if seconds * 1000 >= SQL_SLOW_QUERY_MS:
+            self.slow.append((seconds, statement))
+
+    def repeated(self, threshold: int = SQL_REPEAT_THRESHOLD) -> list[tuple[str, int]]:
+        """
+        Statements run `threshold`+ times with identical SQL (parameters are
+        bound separately, so a loop of lookups shows up as one string): the
+        usual shape of an N+1.
+        """
+        return [(sql, n) for sql, n in self.statements.most_common() if n >= threshold]
+
+
+_profile: contextvars.ContextVar[QueryProfile | None] = contextvars.ContextVar("sql_profile", default=None)
+
+# QueryProfiles collecting from every thread (see capture_queries)
+_captures: list[QueryProfile] = []
+_captures_lock = threading.Lock()
+
+
+def _short(statement: str, limit: int = 160) -> str:
+    statement = " ".join(statement.split())
+    return statement if len(statement) <= limit else statement[:limit - 3] + "..."
+
+
+def attach_query_profiler(engine) -> None:
+    """
+    Time every statement on `engine` (pass `async_engine.sync_engine` for the
+    async one). Costs a context lookup per statement when nothing listens.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        if context is not None and (_profile.get() is not None or _captures):
+            context._profile_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_profile_start", None)
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+
+        profile = _profile.get()
+        if profile is not None:
+            profile.record(statement, elapsed)
+        if _captures:
+            with _captures_lock:
+                for capture in _captures:
+                    capture.record(statement, elapsed)
+
+
+def format_summary(label: str, profile: QueryProfile) -> str:
+    lines = [f"[sql] {label}: {profile.count} queries, {profile.total_seconds * 1000:.1f} ms in DB"]
+    for statement, n in profile.repeated():
+        lines.append(f"[sql]   repeated {n}x (N+1?): {_short(statement)}")
+    for seconds, statement in sorted(profile.slow, reverse=True):
+        lines.append(f"[sql]   slow {seconds * 1000:.1f} ms: {_short(statement)}")
+    return "\n".join(lines)
+
+
+class SqlProfilerMiddleware:
+    """
+    Opt-in (SQL_PROFILE=true) per-request SQL report: query count and DB
+    time, statements repeated SQL_REPEAT_THRESHOLD+ times and queries slower
+    than SQL_SLOW_QUERY_MS. Only flagged requests are printed unless
+    SQL_PROFILE_LOG_ALL is set.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = QueryProfile()
+        token = _profile.set(profile)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _profile.reset(token)
+            if SQL_PROFILE_LOG_ALL or profile.slow or profile.repeated():
+                print(format_summary(f"{scope['method']} {route_label(scope)}", profile))
+
+
+@contextmanager
+def capture_queries():
+    """
+    Collect every statement run (on any thread) while the block executes;
+    yields the QueryProfile. Meant for tests, where TestClient serves the
+    request on another thread than the one asserting.
+    """
+    profile = QueryProfile()
+    with _captures_lock:
+        _captures.append(profile)
+    try:
+        yield profile
+    finally:
+        with _captures_lock:
+            _captures.remove(profile)
+
+
+@contextmanager
+def assert_max_queries(limit: int):
+    """
+    with assert_max_queries(3):
+        client.get("/public/orders/o1")
+
+    Fails with the statements that ran when more than `limit` did.
+    """
+    with capture_queries() as profile:
+        yield profile
+    if profile.count > limit:
+        raise AssertionError(
+            f"Expected at most {limit} queries, got {profile.count}\n"
+            + "\n".join(f"  {n}x {_short(sql)}" for sql, n in profile.statements.most_common())
+        )
@@ -0,0 +1,17 @@
+import os
+import re
+
+from starlette.staticfiles import StaticFiles
+
+# Content-addressed uploads: <sha256>.<ext> and their <sha256>_<variant>.<ext>
+# resizes. The name changes whenever the bytes do, so they never go stale.
+IMMUTABLE_NAME = re.compile(r"^[0-9a-f]{64}(_[a-z]+)?\.(jpg|png|webp)$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class CachedStaticFiles(StaticFiles):
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        if IMMUTABLE_NAME.match(os.path.basename(full_path)):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
@@ -0,0 +1,76 @@
+import os
+from contextlib import nullcontext
+
+import sentry_sdk
+
+SENTRY_DSN = os.getenv("SENTRY_DSN", "").strip()
+SENTRY_ENVIRONMENT = os.getenv("SENTRY_ENVIRONMENT", "").strip() or None
+SENTRY_RELEASE = os.getenv("SENTRY_RELEASE", "").strip() or None
+SENTRY_SAMPLE_RATE = float(os.getenv("SENTRY_SAMPLE_RATE", "1.0"))
+SENTRY_TRACES_SAMPLE_RATE = float(os.getenv("SENTRY_TRACES_SAMPLE_RATE", "0.1"))
+SENTRY_PROFILES_SAMPLE_RATE = float(os.getenv("SENTRY_PROFILES_SAMPLE_RATE", "0"))
+
+# never traced: scrapes, static files, the live order feeds
+UNTRACED_PATH_PREFIXES = ("/metrics", "/static/", "/orders/stream", "/ws/")
+
+
+def _traces_sampler(sampling_context: dict) -> float:
+    parent_sampled = sampling_context.get("parent_sampled")
+    if parent_sampled is not None:
+        return float(parent_sampled)
+    scope = sampling_context.get("asgi_scope") or {}
+    if str(scope.get("path", "")).startswith(UNTRACED_PATH_PREFIXES):
+        return 0.0
+    return SENTRY_TRACES_SAMPLE_RATE
+
+
+def init_tracing(dsn: str | None = None, transport=None) -> bool:
+    """
+    Initialise Sentry error reporting and tracing: a transaction per route
+    (named by its template), a span per SQL statement and per Telegram call.
+    A no-op without a DSN. `transport` replaces the network transport, so
+    tests can capture envelopes offline with any stand-in DSN.
+
+    Must run before the FastAPI app is created.
+    """
+    dsn = dsn or SENTRY_DSN
+    if not dsn:
+        return False
+
+    from sentry_sdk.integrations.fastapi import FastApiIntegration
+    from sentry_sdk.integrations.httpx import HttpxIntegration
+    from sentry_sdk.integrations.sqlalchemy import SqlalchemyIntegration
+    from sentry_sdk.integrations.starlette import StarletteIntegration
+
+    sentry_sdk.init(
+        dsn=dsn,
+        transport=transport,
+        environment=SENTRY_ENVIRONMENT,
+        release=SENTRY_RELEASE,
+        sample_rate=SENTRY_SAMPLE_RATE,
+        traces_sampler=_traces_sampler,
+        profiles_sample_rate=SENTRY_PROFILES_SAMPLE_RATE,
+        send_default_pii=False,
+        integrations=[
+            StarletteIntegration(transaction_style="url"),
+            FastApiIntegration(transaction_style="url"),
+            SqlalchemyIntegration(),
+        ],
+        # Bot API URLs carry the bot token: Telegram calls get their own
+        # span (see telegram_span) and no trace headers are sent to them.
+        disabled_integrations=[HttpxIntegration()],
+        trace_propagation_targets=[],
+    )
+    return True
+
+
+def telegram_span(method: str):
+    """
+    Span around one Bot API call. Calls made outside a request (outbox,
+    update workers) start their own transaction so they are still sampled.
+    """
+    if not sentry_sdk.is_initialized():
+        return nullcontext()
+    if sentry_sdk.get_current_span() is None:
+        return sentry_sdk.start_transaction(op="telegram", name=f"telegram.{method}")
+    return sentry_sdk.start_span(op="http.client", name=f"telegram {method}")
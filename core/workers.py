@@ -0,0 +1,29 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", "2"))
+
+_process_pool: ProcessPoolExecutor | None = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Shared pool for CPU-heavy work (image resizing, QR rendering) so it never
+    runs on a request worker. Uses `spawn` so children don't inherit the
+    event loop, DB pools or sockets of the web process.
+    """
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(
+            max_workers=max(WORKER_PROCESSES, 1),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _process_pool
+
+
+def shutdown_process_pool() -> None:
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
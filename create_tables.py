@@ -1,7 +1,7 @@
 import os
 import importlib
 from core.db import Base, engine
-from sqlalchemy import inspect
+from sqlalchemy import inspect, text
 from sqlalchemy.exc import SQLAlchemyError
 
 def import_models(base_path: str, sub_path: str = "api"):
@@ -19,6 +19,28 @@ def import_models(base_path: str, sub_path: str = "api"):
                 except ImportError as e:
                     print(f"Error importing {module_name}: {e}")
 
+# Tables that gained indexes after they were first created: create_all()
+# never adds indexes to a table that already exists, so these are checked
+# one by one. "products" (the gin_trgm_ops search indexes) is added once
+# pg_trgm is enabled.
+INDEXED_TABLES = ["orders", "telegram_users"]
+
+def create_missing_indexes(table_names):
+    """
+    Create the indexes declared on the models for `table_names` that the
+    database does not have yet (CREATE INDEX only when missing).
+    """
+    for table_name in table_names:
+        table = Base.metadata.tables.get(table_name)
+        if table is None:
+            continue
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            try:
+                index.create(bind=engine, checkfirst=True)
+            except SQLAlchemyError as e:
+                print(f"Error creating index {index.name}: {e}")
+        print(f"Indexes on {table_name} are up to date.")
+
 def create_tables():
     """
     Create all tables defined in the models.
@@ -48,12 +70,25 @@ def create_tables():
     tables_in_public = inspector.get_table_names(schema='public')
     print(f"Tables in the public schema before creation: {tables_in_public}")
     
+    indexed_tables = list(INDEXED_TABLES)
+    if engine.dialect.name == "postgresql":
+        # product search indexes use gin_trgm_ops
+        try:
+            with engine.begin() as connection:
+                connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            print("pg_trgm extension is available.")
+            indexed_tables.append("products")
+        except SQLAlchemyError as e:
+            print(f"Error creating pg_trgm extension: {e}")
+
     try:
         # Attempt to create all tables
         Base.metadata.create_all(bind=engine)
         print("All tables have been created successfully.")
     except SQLAlchemyError as e:
         print(f"Error creating tables: {e}")
+
+    create_missing_indexes(indexed_tables)
     
     # Verify tables after creation
     tables_in_public_after = inspector.get_table_names(schema='public')
@@ -1,40 +1,113 @@
+import os
+
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
 
+from core.cache import TTLCache
 from core.db import get_db
+from core.invalidation import invalidation_bus
 from core.security import decode_access_token
 from api.admin_user.models import AdminUser
-from fastapi import Depends, HTTPException
 
 bearer = HTTPBearer(auto_error=False)
 
+ADMIN_AUTH_CACHE_TTL = float(os.getenv("ADMIN_AUTH_CACHE_TTL", "60"))
+ADMIN_AUTH_CACHE_SIZE = int(os.getenv("ADMIN_AUTH_CACHE_SIZE", "256"))
 
-def get_current_user(
-    db: Session = Depends(get_db),
-    cred: HTTPAuthorizationCredentials = Depends(bearer),
-) -> AdminUser:
+# token subject (username) -> detached, active AdminUser
+_admin_cache = TTLCache(maxsize=ADMIN_AUTH_CACHE_SIZE, ttl=ADMIN_AUTH_CACHE_TTL)
+
+# bumped on every eviction; an admin read before an eviction is not cached
+_admin_generation = 0
+
+
+def invalidate_admin_user(username: str | None = None) -> None:
+    """
+    Drop one cached admin (or all of them when `username` is None).
+    """
+    global _admin_generation
+    _admin_generation += 1
+    if username is None:
+        _admin_cache.clear()
+    else:
+        _admin_cache.pop(username)
+
+
+invalidation_bus.register("admin_user", invalidate_admin_user)
+
+
+@event.listens_for(AdminUser, "after_update")
+@event.listens_for(AdminUser, "after_delete")
+def _evict_changed_admin(mapper, connection, target) -> None:
+    # Covers deactivation, role changes and renames from any write path.
+    usernames = {target.username}
+    history = inspect(target).attrs.username.history
+    usernames.update(history.deleted or ())
+    for username in usernames:
+        invalidate_admin_user(username)
+
+    # evicted again, and other workers told, once the change is committed:
+    # until then a concurrent request can still read and cache the old row
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_admins", set()).update(usernames)
 
-    if not cred:
-        raise HTTPException(status_code=401, detail="Missing token")
 
+@event.listens_for(Session, "after_commit")
+def _publish_changed_admins(session) -> None:
+    for username in session.info.pop("changed_admins", ()):
+        invalidate_admin_user(username)
+        invalidation_bus.publish("admin_user", username)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_admins(session) -> None:
+    session.info.pop("changed_admins", None)
+
+
+def authenticate_token(db: Session, token: str) -> AdminUser:
+    """
+    Resolve a bearer token to its active admin (cached), or raise 401.
+    """
     try:
-        payload = decode_access_token(cred.credentials)
+        payload = decode_access_token(token)
         username = payload.get("sub")
         if not username:
             raise Exception()
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+    user = _admin_cache.get(username)
+    if user is not None:
+        return user
+
+    generation = _admin_generation
     user = db.query(AdminUser).filter(AdminUser.username == username).first()
 
     if not user or not user.is_active:
         raise HTTPException(status_code=401, detail="User not found")
 
+    # Detach so the cached instance outlives this request's session.
+    db.expunge(user)
+    if generation == _admin_generation:
+        _admin_cache.set(username, user)
     return user
+
+
+def get_current_user(
+    db: Session = Depends(get_db),
+    cred: HTTPAuthorizationCredentials = Depends(bearer),
+) -> AdminUser:
+
+    if not cred:
+        raise HTTPException(status_code=401, detail="Missing token")
+
+    return authenticate_token(db, cred.credentials)
 def require_role(*roles: str):
     def checker(user=Depends(get_current_user)):
         if user.role not in roles:
             raise HTTPException(status_code=403, detail="Admin only")
         return user
-    return checker
\ No newline at end of file
+    return checker
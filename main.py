@@ -1,23 +1,74 @@
 from api.admin_user.views import init_admin_auth
 import os
 
+from config import config
+from core.db import async_engine, engine, warm_up_pools
+from core.invalidation import invalidation_bus
+from core.metrics import MetricsMiddleware, instrument_engine, mark_worker_dead
+from core import sql_profiler
+from core.static import CachedStaticFiles
+from core.tracing import init_tracing
+from core.workers import shutdown_process_pool
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+
+init_tracing()
 
 app = FastAPI()
 init_admin_auth(app)
 
+
+@app.on_event("startup")
+async def init_db_pools() -> None:
+    try:
+        await warm_up_pools()
+    except Exception as exc:
+        print(f"Database pool warm-up failed: {exc}")
+
+
+@app.on_event("startup")
+async def start_invalidation_bus() -> None:
+    # LISTEN/NOTIFY is Postgres-only; a single SQLite process needs no bus.
+    if async_engine.dialect.name == "postgresql":
+        await invalidation_bus.start(config.ASYNC_DATABASE_URL)
+
+
+@app.on_event("shutdown")
+async def close_process_pool() -> None:
+    shutdown_process_pool()
+
+
+@app.on_event("shutdown")
+async def stop_invalidation_bus() -> None:
+    await invalidation_bus.stop()
+
+
+@app.on_event("shutdown")
+async def drop_worker_metrics() -> None:
+    mark_worker_dead()
+
+
 os.makedirs("static/images", exist_ok=True)
 
 # Mount the static folder
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", CachedStaticFiles(directory="static"), name="static")
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
+app.add_middleware(MetricsMiddleware)
+
+instrument_engine(engine, "sync")
+instrument_engine(async_engine.sync_engine, "async")
+
+sql_profiler.attach_query_profiler(engine)
+sql_profiler.attach_query_profiler(async_engine.sync_engine)
+if sql_profiler.SQL_PROFILE:
+    app.add_middleware(sql_profiler.SqlProfilerMiddleware)
 
 from api.register import *
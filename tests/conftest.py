@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+# Point both engines at a throwaway SQLite file before core.db builds them.
+import config  # noqa: E402
+
+TEST_DB = os.path.join(ROOT, ".pytest_cache", "test.db")
+os.makedirs(os.path.dirname(TEST_DB), exist_ok=True)
+if os.path.exists(TEST_DB):
+    os.remove(TEST_DB)
+config.Config.DATABASE_URL = config.config.DATABASE_URL = f"sqlite:///{TEST_DB}"
+config.Config.ASYNC_DATABASE_URL = config.config.ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{TEST_DB}"
+config.Config.DB_ECHO = config.config.DB_ECHO = False
+os.environ.setdefault("TELEGRAM_BOT_USERNAME", "testbot")
+
+import main  # noqa: E402
+import api.register  # noqa: E402,F401
+from api.tables.qr import qr_manifest  # noqa: E402
+from core.db import Base, engine  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+
+    Base.metadata.create_all(engine)
+    # QR images are not under test: never queue renders on the process pool
+    qr_manifest.ensure = lambda table_code, start_url: None
+    with TestClient(main.app) as client:
+        yield client
+    Base.metadata.drop_all(engine)
+
+
+@pytest.fixture(scope="session")
+def auth_headers(client):
+    client.post("/auth/seed-admin")
+    response = client.post("/auth/login", json={"username": "admin", "password": "admin123"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
@@ -0,0 +1,127 @@
+import io
+import json
+import zipfile
+
+import pytest
+from PIL import Image
+from sqlalchemy.exc import SQLAlchemyError
+
+import api.products.importer as importer
+import api.products.views as product_views
+
+HEADER = "id,category_id,name,name_lc,price_usd,price_khr,is_active,image\n"
+
+
+@pytest.fixture(scope="module")
+def category(client, auth_headers):
+    response = client.post(
+        "/category",
+        data={"id": "imp-c", "name": "Imported", "name_lc": "Imported", "short_order": 1},
+        headers=auth_headers,
+    )
+    assert response.status_code < 300, response.text
+    return "imp-c"
+
+
+@pytest.fixture(autouse=True)
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(importer, "UPLOAD_DIR", str(tmp_path))
+    return tmp_path
+
+
+def _import(client, auth_headers, body: str, filename="products.csv", images: bytes | None = None):
+    files = {"file": (filename, body.encode("utf-8"), "text/csv")}
+    if images is not None:
+        files["images"] = ("images.zip", images, "application/zip")
+    response = client.post("/product/import", files=files, headers=auth_headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _png() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), "red").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def test_report_lists_every_rejected_row(client, auth_headers, category):
+    body = HEADER + "\n".join([
+        "imp-1,imp-c,Rice,,2,8000,true,",          # row 2: ok
+        "imp-2,imp-c,Soup,,abc,8000,true,",        # row 3: bad price
+        "imp-3,missing,Tea,,1,4000,true,",         # row 4: unknown category
+        "imp-4,imp-c,Noodles,,3,12000,true,",      # row 5: superseded by row 6
+        "imp-4,imp-c,Noodles XL,,4,16000,true,",   # row 6: ok
+        "imp-5,imp-c,Cake,,1,4000,maybe,",         # row 7: bad is_active
+        "imp-6,imp-c,Pie,,1,4000,true,pie.png",    # row 8: image but no archive
+    ]) + "\n"
+
+    report = _import(client, auth_headers, body)
+
+    assert report["imported"] == 2
+    assert report["imported"] + report["failed"] == 7
+    errors = {e["row"]: e for e in report["errors"]}
+    assert sorted(errors) == [3, 4, 5, 7, 8]
+    assert "price_usd" in errors[3]["error"]
+    assert "Category missing not found" == errors[4]["error"]
+    assert errors[5]["id"] == "imp-4" and "row 6" in errors[5]["error"]
+    assert "is_active" in errors[7]["error"]
+    assert "archive" in errors[8]["error"]
+
+    product = client.get("/product/imp-4", headers=auth_headers).json()
+    assert product["name"] == "Noodles XL"
+
+
+def test_reimport_updates_existing_products(client, auth_headers, category):
+    _import(client, auth_headers, HEADER + "imp-u,imp-c,Coffee,កាហ្វេ,2,8000,true,\n")
+
+    report = _import(client, auth_headers, HEADER + "imp-u,imp-c,Iced coffee,,3,12000,false,\n")
+
+    assert report == {"imported": 1, "failed": 0, "errors": []}
+    product = client.get("/product/imp-u", headers=auth_headers).json()
+    assert product["name"] == "Iced coffee"
+    assert product["price_usd"] == 3
+    assert product["is_active"] is False
+    assert product["name_lc"] == "កាហ្វេ"  # blank keeps the stored value
+
+
+def test_ndjson_with_image_archive(client, auth_headers, category, upload_dir):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("photos/latte.png", _png())
+    lines = [
+        {"id": "imp-img", "category_id": "imp-c", "name": "Latte", "price_usd": 3, "price_khr": 12000, "image": "latte.png"},
+        {"id": "imp-noimg", "category_id": "imp-c", "name": "Mocha", "price_usd": 3, "price_khr": 12000, "image": "mocha.png"},
+        "not an object",
+    ]
+    body = "\n".join(json.dumps(line) for line in lines) + "\n"
+
+    report = _import(client, auth_headers, body, filename="products.ndjson", images=archive.getvalue())
+
+    assert report["imported"] == 1
+    assert [(e["row"], e["id"]) for e in report["errors"]] == [(2, "imp-noimg"), (3, None)]
+    product = client.get("/product/imp-img", headers=auth_headers).json()
+    assert product["image_url"].endswith(".png")
+    assert len(list(upload_dir.iterdir())) == 1
+
+
+def test_failed_batch_releases_extracted_images(client, auth_headers, category, monkeypatch):
+    async def failing_upsert(db, rows):
+        raise SQLAlchemyError("batch failed")
+
+    released = []
+
+    async def record_release(image_url):
+        released.append(image_url)
+
+    monkeypatch.setattr(importer, "upsert_products", failing_upsert)
+    monkeypatch.setattr(product_views, "release_image", record_release)
+
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("fail.png", _png())
+
+    report = _import(client, auth_headers, HEADER + "imp-f,imp-c,Flan,,1,4000,true,fail.png\n", images=archive.getvalue())
+
+    assert report["imported"] == 0
+    assert report["errors"] == [{"row": 2, "id": "imp-f", "error": "batch failed"}]
+    assert len(released) == 1 and released[0].endswith(".png")
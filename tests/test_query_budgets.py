@@ -0,0 +1,86 @@
+"""
+Query-count budgets for hot paths: a change that turns one of these into an
+N+1 fails here instead of in production. Budgets must not grow with the
+number of items or tables involved.
+"""
+import pytest
+
+from api.order_items.views import recalc_order_totals
+from api.public.order_cache import invalidate_public_order
+from api.tables.models import TableModel
+from api.tables.views import serialize_table_with_qr
+from core.db import AsyncSessionLocal
+from core.sql_profiler import assert_max_queries
+
+ITEMS = 12
+TABLES = 12
+
+
+@pytest.fixture(scope="module")
+def order_id(client, auth_headers):
+    def ok(response):
+        assert response.status_code < 300, response.text
+        return response.json()
+
+    ok(client.post("/category", data={"id": "qb-c", "name": "Budget", "name_lc": "Budget", "short_order": 1}, headers=auth_headers))
+    for i in range(ITEMS):
+        ok(client.post(
+            "/product",
+            data={"id": f"qb-p{i}", "category_id": "qb-c", "name": f"Dish {i}", "price_usd": 1, "price_khr": 4000},
+            headers=auth_headers,
+        ))
+    for i in range(TABLES):
+        ok(client.post("/table", data={"id": f"qb-t{i}", "code": f"QB{i}", "name": f"Budget {i}"}, headers=auth_headers))
+    ok(client.post(
+        "/telegram_user",
+        data={"row_id": "qb-u", "telegram_user_id": "9001", "telegram_username": "budget"},
+        headers=auth_headers,
+    ))
+    ok(client.post("/order", data={"id": "qb-o", "table_id": "qb-t0", "telegram_user_id": "qb-u"}, headers=auth_headers))
+    for i in range(ITEMS):
+        ok(client.post(
+            "/order_item",
+            data={"id": f"qb-i{i}", "order_id": "qb-o", "product_id": f"qb-p{i}", "qty": 1},
+            headers=auth_headers,
+        ))
+    return "qb-o"
+
+
+def test_public_get_order_loads_in_one_query(client, order_id):
+    invalidate_public_order(order_id)
+    with assert_max_queries(1):
+        response = client.get(f"/public/orders/{order_id}")
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == ITEMS
+
+
+def test_public_get_order_cache_hit_runs_no_query(client, order_id):
+    client.get(f"/public/orders/{order_id}")
+    with assert_max_queries(0):
+        response = client.get(f"/public/orders/{order_id}")
+    assert response.status_code == 200
+
+
+def test_recalc_order_totals_is_one_statement(client, order_id):
+    async def recalc():
+        async with AsyncSessionLocal() as db:
+            row = await recalc_order_totals(db, order_id)
+            await db.commit()
+            return row
+
+    with assert_max_queries(1):
+        row = client.portal.call(recalc)
+    assert row.total_amount == ITEMS * 4000
+
+
+def test_serialize_table_with_qr_runs_no_query(client, order_id):
+    table = TableModel(id="qb-detached", code="QBX", name=None, is_active=True)
+    with assert_max_queries(0):
+        serialize_table_with_qr(table)
+
+
+def test_table_list_does_not_query_per_table(client, auth_headers, order_id):
+    client.get("/table", headers=auth_headers)  # admin now cached
+    with assert_max_queries(1):
+        response = client.get("/table", params={"limit": TABLES}, headers=auth_headers)
+    assert len(response.json()) == TABLES